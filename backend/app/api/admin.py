@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session, undefer, load_only, joinedload, selectinload
 from sqlalchemy import desc, func
 from typing import List, Optional
 from datetime import datetime, timedelta
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.counts import count_query
+from app.core.pagination import apply_keyset, next_cursor
 from app.models import models, schemas
 from app.api.auth import get_current_admin_user
+from app.core.principals import Principal
+from app.services.search import apply_product_search, is_ranked_search, render_snippet
+from app.services.outbox import enqueue_email
+from app.services.reservations import InsufficientStock, set_stock
 import json
 
 router = APIRouter()
@@ -13,8 +19,8 @@ router = APIRouter()
 # Dashboard & Analytics
 @router.get("/dashboard")
 def get_admin_dashboard(
-    admin_user: models.User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    admin_user: Principal = Depends(get_current_admin_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get admin dashboard statistics"""
     
@@ -32,7 +38,15 @@ def get_admin_dashboard(
     recent_orders = db.query(models.Order).order_by(desc(models.Order.created_at)).limit(5).all()
     
     # Low stock products
-    low_stock_products = db.query(models.Product).filter(
+    low_stock_products = db.query(models.Product).options(
+        load_only(
+            models.Product.id,
+            models.Product.name,
+            models.Product.stock_quantity,
+            models.Product.reserved_quantity,
+            models.Product.price
+        )
+    ).filter(
         models.Product.stock_quantity < 10,
         models.Product.is_active == True
     ).limit(10).all()
@@ -68,6 +82,7 @@ def get_admin_dashboard(
                 "id": product.id,
                 "name": product.name,
                 "stock_quantity": product.stock_quantity,
+                "available_quantity": product.available_quantity,
                 "price": product.price
             } for product in low_stock_products
         ],
@@ -80,7 +95,7 @@ def get_admin_dashboard(
     }
 
 @router.get("/public-stats")
-def get_public_stats(db: Session = Depends(get_db)):
+def get_public_stats(db: Session = Depends(get_read_db)):
     """Get public statistics without authentication"""
     
     # Basic counts only
@@ -116,15 +131,22 @@ def get_public_stats(db: Session = Depends(get_db)):
     }
 
 # User Management
+# Newest-first keyset orders for the admin listings (see app/core/pagination.py)
+USER_SORT = [(models.User.created_at, True), (models.User.id, True)]
+PRODUCT_SORT = [(models.Product.created_at, True), (models.Product.id, True)]
+ORDER_SORT = [(models.Order.created_at, True), (models.Order.id, True)]
+
 @router.get("/users", response_model=List[schemas.User])
 def get_all_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     search: Optional[str] = None,
-    admin_user: models.User = Depends(get_current_admin_user),
+    cursor: Optional[str] = None,
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Get all users with pagination and search"""
+    """Get all users with pagination and search (next page cursor in X-Next-Cursor)"""
     
     query = db.query(models.User)
     
@@ -136,13 +158,18 @@ def get_all_users(
             (models.User.last_name.ilike(search_filter))
         )
     
-    users = query.order_by(desc(models.User.created_at)).offset(skip).limit(limit).all()
+    query = apply_keyset(query, USER_SORT, cursor)
+    users = (query if cursor else query.offset(skip)).limit(limit).all()
+    
+    cursor_value = next_cursor(users, USER_SORT, limit)
+    if cursor_value:
+        response.headers["X-Next-Cursor"] = cursor_value
     return users
 
 @router.put("/users/{user_id}/toggle-admin")
 def toggle_user_admin_status(
     user_id: int,
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Toggle admin status of a user - ONLY ONE ADMIN ALLOWED"""
@@ -183,7 +210,7 @@ def toggle_user_admin_status(
 @router.put("/users/{user_id}/toggle-active")
 def toggle_user_active_status(
     user_id: int,
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Toggle active status of a user"""
@@ -212,51 +239,82 @@ def get_all_products_admin(
     category_id: Optional[int] = None,
     search: Optional[str] = None,
     include_inactive: bool = Query(False),
-    admin_user: models.User = Depends(get_current_admin_user),
+    include_specifications: bool = Query(False, description="Also return each product's specifications (null otherwise)"),
+    cursor: Optional[str] = None,
+    count: str = Query("exact", regex="^(exact|estimate|none)$"),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Get all products for admin with advanced filtering"""
+    """Get all products for admin with advanced filtering.
+    
+    Newest first, paged by next_cursor (or skip/limit); a full-text search
+    without a cursor is ordered by relevance instead and pages by offset only.
+    ?count= picks how "total" is computed (see app/core/counts.py); has_more
+    is always returned.
+    """
     
     query = db.query(models.Product)
     
+    # specifications is deferred on the mapping; only load it when asked for
+    if include_specifications:
+        query = query.options(undefer(models.Product.specifications))
+    
     if not include_inactive:
         query = query.filter(models.Product.is_active == True)
     
     if category_id:
         query = query.filter(models.Product.category_id == category_id)
     
+    # Full-text search (BM25-ranked) when available, LIKE otherwise
+    ranked = is_ranked_search(search) and cursor is None
+    snippet = None
     if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            (models.Product.name.ilike(search_filter)) |
-            (models.Product.description.ilike(search_filter)) |
-            (models.Product.brand.ilike(search_filter)) |
-            (models.Product.model.ilike(search_filter))
-        )
-    
-    products = query.order_by(desc(models.Product.created_at)).offset(skip).limit(limit).all()
+        query, snippet = apply_product_search(query, search, like_columns=[
+            models.Product.name,
+            models.Product.description,
+            models.Product.brand,
+            models.Product.model
+        ], order_by_rank=ranked)
+    
+    # One extra row tells us whether another page exists without counting
+    page_query = query.add_columns(snippet) if snippet is not None else query
+    if ranked:
+        rows = page_query.order_by(desc(models.Product.created_at)).offset(skip).limit(limit + 1).all()
+    else:
+        page_query = apply_keyset(page_query, PRODUCT_SORT, cursor)
+        rows = (page_query if cursor else page_query.offset(skip)).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    cursor_value = None
+    if has_more and not ranked:
+        cursor_value = next_cursor(rows, PRODUCT_SORT, limit, get=(lambda row: row[0]) if snippet is not None else None)
     
     # Format products with additional admin info
     result = []
-    for product in products:
+    for row in rows:
+        product, search_snippet = row if snippet is not None else (row, None)
         product_dict = {
             "id": product.id,
             "name": product.name,
             "description": product.description,
             "price": product.price,
             "stock_quantity": product.stock_quantity,
+            "available_quantity": product.available_quantity,
             "category_id": product.category_id,
             "brand": product.brand,
             "model": product.model,
-            "specifications": product.specifications,
+            "specifications": product.specifications if include_specifications else None,
             "is_active": product.is_active,
             "created_at": product.created_at,
             "updated_at": product.updated_at,
-            "has_image": product.image_data is not None
+            "has_image": product.has_image,
+            "image_version": product.image_version,
+            "search_snippet": render_snippet(search_snippet)
         }
         
         # Parse specifications if it's a JSON string
-        if product.specifications:
+        if include_specifications and product.specifications:
             try:
                 product_dict["specifications"] = json.loads(product.specifications)
             except:
@@ -266,13 +324,15 @@ def get_all_products_admin(
     
     return {
         "products": result,
-        "total": query.count()
+        "total": count_query(query, ["products"], count),
+        "has_more": has_more,
+        "next_cursor": cursor_value
     }
 
 @router.post("/products", response_model=schemas.Product)
 def create_product_admin(
     product: schemas.ProductCreate,
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Create a new product (admin only)"""
@@ -292,13 +352,17 @@ def create_product_admin(
     db.commit()
     db.refresh(db_product)
     
-    return schemas.Product(**{**db_product.__dict__, "has_image": False})
+    return schemas.Product(**{
+        **db_product.__dict__,
+        "specifications": product_data.get("specifications"),
+        "has_image": False
+    })
 
 @router.put("/products/{product_id}")
 def update_product_admin(
     product_id: int,
     product: schemas.ProductCreate,
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Update a product (admin only)"""
@@ -317,6 +381,17 @@ def update_product_admin(
     if isinstance(product_data.get("specifications"), dict):
         product_data["specifications"] = json.dumps(product_data["specifications"])
     
+    # Stock is set in SQL, guarded against the units currently held in carts
+    stock_quantity = product_data.pop("stock_quantity")
+    try:
+        set_stock(db, product_id, stock_quantity)
+    except InsufficientStock:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Stock can't be lower than the {db_product.reserved_quantity} units reserved in customer carts"
+        )
+    
     for field, value in product_data.items():
         setattr(db_product, field, value)
     
@@ -331,7 +406,7 @@ def update_product_admin(
 @router.put("/products/{product_id}/toggle-active")
 def toggle_product_active_status(
     product_id: int,
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Toggle active status of a product"""
@@ -352,7 +427,7 @@ def toggle_product_active_status(
 @router.delete("/products/{product_id}")
 def delete_product_admin(
     product_id: int,
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Delete a product (admin only)"""
@@ -369,7 +444,8 @@ def delete_product_admin(
             detail="Cannot delete product that exists in orders. Deactivate instead."
         )
     
-    # Delete cart items first
+    # Delete cart items and their stock reservations first
+    db.query(models.StockReservation).filter(models.StockReservation.product_id == product_id).delete()
     db.query(models.CartItem).filter(models.CartItem.product_id == product_id).delete()
     
     # Delete product
@@ -382,7 +458,7 @@ def delete_product_admin(
 @router.post("/categories", response_model=schemas.Category)
 def create_category_admin(
     category: schemas.CategoryCreate,
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Create a new category (admin only)"""
@@ -403,7 +479,7 @@ def create_category_admin(
 def update_category_admin(
     category_id: int,
     category: schemas.CategoryCreate,
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Update a category (admin only)"""
@@ -435,7 +511,7 @@ def update_category_admin(
 @router.delete("/categories/{category_id}")
 def delete_category_admin(
     category_id: int,
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Delete a category (admin only)"""
@@ -464,10 +540,12 @@ def get_all_orders_admin(
     limit: int = Query(50, ge=1, le=100),
     status_filter: Optional[str] = None,
     search: Optional[str] = None,
-    admin_user: models.User = Depends(get_current_admin_user),
+    cursor: Optional[str] = None,
+    count: str = Query("exact", regex="^(exact|estimate|none)$"),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Get all orders for admin with filtering"""
+    """Get all orders for admin with filtering (newest first, paged by next_cursor or skip/limit)"""
     
     query = db.query(models.Order)
     
@@ -483,12 +561,23 @@ def get_all_orders_admin(
             (models.User.last_name.ilike(f"%{search}%"))
         )
     
-    orders = query.order_by(desc(models.Order.created_at)).offset(skip).limit(limit).all()
+    # One extra row tells us whether another page exists without counting
+    page_query = apply_keyset(query, ORDER_SORT, cursor).options(
+        # Customer columns come back in the same query instead of one lookup per order
+        joinedload(models.Order.user).load_only(
+            models.User.email,
+            models.User.first_name,
+            models.User.last_name
+        )
+    )
+    orders = (page_query if cursor else page_query.offset(skip)).limit(limit + 1).all()
+    has_more = len(orders) > limit
+    orders = orders[:limit]
     
     # Format orders with user info
     result = []
     for order in orders:
-        user = db.query(models.User).filter(models.User.id == order.user_id).first()
+        user = order.user
         order_dict = {
             "id": order.id,
             "order_number": order.order_number,
@@ -507,14 +596,16 @@ def get_all_orders_admin(
     
     return {
         "orders": result,
-        "total": query.count()
+        "total": count_query(query, ["orders", "users"], count),
+        "has_more": has_more,
+        "next_cursor": next_cursor(orders, ORDER_SORT, limit) if has_more else None
     }
 
 @router.put("/orders/{order_id}/status")
 def update_order_status(
     order_id: int,
     status: str = Query(..., regex="^(pending|confirmed|processing|shipped|delivered|cancelled)$"),
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Update order status (admin only)"""
@@ -525,6 +616,19 @@ def update_order_status(
     
     old_status = order.status
     order.status = status
+    
+    if status != old_status:
+        # Let the customer know; delivered by the outbox worker
+        user = db.query(models.User).filter(models.User.id == order.user_id).first()
+        if user:
+            enqueue_email(
+                db,
+                "order_status",
+                user.email,
+                order_id=order.id,
+                user_name=f"{user.first_name} {user.last_name}",
+                new_status=status
+            )
     db.commit()
     
     return {
@@ -537,24 +641,29 @@ def update_order_status(
 @router.get("/orders/{order_id}")
 def get_order_details_admin(
     order_id: int,
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Get detailed order information (admin only)"""
     
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    # Order + customer in one query, then all items with their product names in one more
+    order = db.query(models.Order).options(
+        joinedload(models.Order.user),
+        selectinload(models.Order.order_items).joinedload(models.OrderItem.product).load_only(
+            models.Product.name
+        )
+    ).filter(models.Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     # Get user info
-    user = db.query(models.User).filter(models.User.id == order.user_id).first()
+    user = order.user
     
     # Get order items with product details
-    order_items = db.query(models.OrderItem).filter(models.OrderItem.order_id == order_id).all()
     items_details = []
     
-    for item in order_items:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
+    for item in order.order_items:
+        product = item.product
         items_details.append({
             "id": item.id,
             "product_id": item.product_id,
@@ -590,7 +699,7 @@ def get_order_details_admin(
 # Inventory Management Functions (existing)
 @router.post("/populate-electronics-inventory")
 def populate_electronics_inventory(
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Populate database with professional electronics components inventory"""
@@ -863,7 +972,7 @@ def populate_electronics_inventory(
 
 @router.delete("/clear-inventory")
 def clear_inventory(
-    admin_user: models.User = Depends(get_current_admin_user),
+    admin_user: Principal = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Clear all existing inventory data from database"""
@@ -872,6 +981,7 @@ def clear_inventory(
         # Delete all data in correct order (respect foreign key constraints)
         deleted_order_items = db.query(models.OrderItem).delete()
         deleted_orders = db.query(models.Order).delete()
+        db.query(models.StockReservation).delete()
         deleted_cart_items = db.query(models.CartItem).delete()
         deleted_products = db.query(models.Product).delete()
         deleted_categories = db.query(models.Category).delete()
@@ -899,8 +1009,8 @@ def clear_inventory(
 
 @router.get("/inventory-status")
 def get_inventory_status(
-    admin_user: models.User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    admin_user: Principal = Depends(get_current_admin_user),
+    db: Session = Depends(get_read_db)
 ):
     """Get current inventory status and statistics"""
     
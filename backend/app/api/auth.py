@@ -1,30 +1,70 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta, datetime
-from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.database import get_db, get_async_db
+from app.core.principals import Principal, principal_cache
+from app.core.hashing import password_hasher, PasswordHasherBusy
+from app.core.ratelimit import auth_ip_limiter, login_email_limiter, LOGIN_MAX_FAILED_ATTEMPTS, LOGIN_LOCKOUT_MINUTES
+from app.core.security import create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from app.models import models, schemas
 from app.services.email import email_service
+from app.services.outbox import enqueue_email
+from app.services.refresh_tokens import InvalidRefreshToken, issue_refresh_token, revoke_refresh_token, rotate_refresh_token
 
 router = APIRouter()
 security = HTTPBearer()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    token = credentials.credentials
-    email = verify_token(token)
+def _token_subject(credentials: HTTPAuthorizationCredentials) -> str:
+    email = verify_token(credentials.credentials)
     if email is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(models.User).filter(models.User.email == email).first()
+    return email
+
+# Columns behind a Principal; the rest of the User row isn't needed to authenticate
+PRINCIPAL_COLUMNS = (models.User.id, models.User.email, models.User.is_admin, models.User.is_active)
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)) -> Principal:
+    """The authenticated user as a cached Principal (id, email, is_admin, is_active)"""
+    email = _token_subject(credentials)
+    principal = principal_cache.get(email)
+    if principal is None:
+        generation = principal_cache.generation()
+        user = db.query(*PRINCIPAL_COLUMNS).filter(models.User.email == email).first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal.from_user(user)
+        principal_cache.set(email, principal, generation)
+    return principal
+
+async def get_current_user_async(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    """get_current_user for async endpoints, so authentication doesn't take a threadpool slot"""
+    email = _token_subject(credentials)
+    principal = principal_cache.get(email)
+    if principal is None:
+        generation = principal_cache.generation()
+        result = await db.execute(select(*PRINCIPAL_COLUMNS).where(models.User.email == email))
+        user = result.first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal.from_user(user)
+        principal_cache.set(email, principal, generation)
+    return principal
+
+def get_current_user_record(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)) -> models.User:
+    """The full User row, for endpoints that read or edit profile fields"""
+    user = db.get(models.User, current_user.id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-def get_current_admin_user(current_user: models.User = Depends(get_current_user)):
+def get_current_admin_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Get current user and verify admin privileges"""
     if not current_user.is_admin:
         raise HTTPException(
@@ -33,11 +73,76 @@ def get_current_admin_user(current_user: models.User = Depends(get_current_user)
         )
     return current_user
 
+def _token_response(email: str, refresh_token: str) -> dict:
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": email}, expires_delta=access_token_expires
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": int(access_token_expires.total_seconds())
+    }
+
+def _client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+    return request.client.host if request.client else "unknown"
+
+def _too_many_attempts(retry_after: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many attempts, please try again later",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+async def _record_failed_login(db: AsyncSession, user_id: int, now: datetime):
+    """Count a failed password; lock the account once LOGIN_MAX_FAILED_ATTEMPTS is reached.
+
+    Failures more than LOGIN_LOCKOUT_MINUTES apart don't add up: the count
+    starts over, so occasional typos never lock anyone out.
+    """
+    # One conditional UPDATE, so concurrent failures can't overwrite each other's
+    # count (and no RETURNING, which MySQL lacks). MySQL evaluates SET left to
+    # right against already-updated columns, so the columns the CASEs read
+    # (login_attempts, last_failed_login) are assigned after the ones using them.
+    stale = or_(
+        models.User.last_failed_login.is_(None),
+        models.User.last_failed_login <= now - timedelta(minutes=LOGIN_LOCKOUT_MINUTES)
+    )
+    attempts = case((stale, 1), else_=func.coalesce(models.User.login_attempts, 0) + 1)
+    locks = attempts >= LOGIN_MAX_FAILED_ATTEMPTS
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .ordered_values(
+            (models.User.account_locked_until, case(
+                (locks, now + timedelta(minutes=LOGIN_LOCKOUT_MINUTES)),
+                else_=models.User.account_locked_until
+            )),
+            (models.User.login_attempts, case((locks, 0), else_=attempts)),
+            (models.User.last_failed_login, now)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in requests, please try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, request: Request, db: AsyncSession = Depends(get_async_db)):
+    retry_after = auth_ip_limiter.hit(_client_ip(request))
+    if retry_after:
+        raise _too_many_attempts(retry_after)
+    
     # Check if user already exists
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
+    result = await db.execute(select(models.User.id).where(models.User.email == user.email))
+    if result.first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Generate verification token
@@ -45,7 +150,10 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     verification_expires = datetime.utcnow() + timedelta(hours=24)
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise _hashing_busy()
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
@@ -61,42 +169,102 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
         verification_token_expires=verification_expires
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
     
-    # Send verification email
-    try:
-        email_service.send_verification_email(
-            user_email=user.email,
-            user_name=f"{user.first_name} {user.last_name}",
-            verification_token=verification_token
-        )
-    except Exception as e:
-        print(f"Failed to send verification email: {e}")
-        # Don't fail registration if email sending fails
+    # Queued with the user so it's sent only if registration commits
+    enqueue_email(
+        db.sync_session,
+        "verification",
+        user.email,
+        user_name=f"{user.first_name} {user.last_name}",
+        verification_token=verification_token
+    )
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=schemas.Token)
-def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == user_credentials.email).first()
+async def login(user_credentials: schemas.UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Throttle before touching the database or the password hash
+    retry_after = auth_ip_limiter.hit(_client_ip(request)) or login_email_limiter.hit(user_credentials.email.lower())
+    if retry_after:
+        raise _too_many_attempts(retry_after)
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    result = await db.execute(select(models.User).where(models.User.email == user_credentials.email))
+    user = result.scalars().first()
+    
+    now = datetime.utcnow()
+    locked = bool(user and user.account_locked_until and user.account_locked_until > now)
+    
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await password_hasher.verify(user_credentials.password, user.hashed_password)
+        except PasswordHasherBusy:
+            raise _hashing_busy()
+    
+    # A locked account answers a wrong password exactly like an unknown email,
+    # so the lock doesn't reveal which accounts exist (and failures while locked
+    # don't extend it; the email limiter still throttles them)
+    if not valid:
+        if user and not locked:
+            await _record_failed_login(db, user.id, now)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    if locked:
+        # Only someone who knows the password learns about the lock
+        raise HTTPException(
+            status_code=status.HTTP_423_LOCKED,
+            detail="Account temporarily locked after too many failed logins. Please try again later.",
+            headers={"Retry-After": str(int((user.account_locked_until - now).total_seconds()) + 1)},
+        )
+    
+    if new_hash:
+        # Stored with old hashing parameters (e.g. PASSWORD_HASH_ROUNDS changed)
+        user.hashed_password = new_hash
+    user.login_attempts = 0
+    user.account_locked_until = None
+    user.last_failed_login = None
+    user.last_login = now
+    refresh_token = issue_refresh_token(db.sync_session, user.id)
+    await db.commit()
+    login_email_limiter.reset(user_credentials.email.lower())
+    
+    return _token_response(user.email, refresh_token)
+
+@router.post("/refresh", response_model=schemas.Token)
+def refresh(request: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """Trade a refresh token for a new access token (and a new refresh token)"""
+    try:
+        user_id, refresh_token = rotate_refresh_token(db, request.refresh_token)
+    except InvalidRefreshToken as e:
+        # Keep the family revocation a reused token triggers
+        db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    email = db.query(models.User.email).filter(models.User.id == user_id).scalar()
+    if email is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    db.commit()
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return _token_response(email, refresh_token)
+
+@router.post("/logout")
+def logout(request: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """Revoke the refresh token; the current access token lapses on its own"""
+    revoke_refresh_token(db, request.refresh_token)
+    db.commit()
+    return {"message": "Logged out"}
 
 @router.get("/me", response_model=schemas.User)
-def read_users_me(current_user: models.User = Depends(get_current_user)):
+def read_users_me(current_user: models.User = Depends(get_current_user_record)):
     return current_user
 
 @router.post("/verify-email")
@@ -137,23 +305,21 @@ def resend_verification(email: str, db: Session = Depends(get_db)):
     
     user.email_verification_token = verification_token
     user.verification_token_expires = verification_expires
+    enqueue_email(
+        db,
+        "verification",
+        user.email,
+        user_name=f"{user.first_name} {user.last_name}",
+        verification_token=verification_token
+    )
     db.commit()
     
-    # Send verification email
-    try:
-        email_service.send_verification_email(
-            user_email=user.email,
-            user_name=f"{user.first_name} {user.last_name}",
-            verification_token=verification_token
-        )
-        return {"message": "Verification email sent successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Failed to send verification email")
+    return {"message": "Verification email sent successfully"}
 
 @router.put("/me", response_model=schemas.User)
 def update_user_me(
     user_update: schemas.UserBase,
-    current_user: models.User = Depends(get_current_user),
+    current_user: models.User = Depends(get_current_user_record),
     db: Session = Depends(get_db)
 ):
     for field, value in user_update.dict(exclude_unset=True).items():
@@ -1,27 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 from typing import List
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.models import models, schemas
-from app.api.auth import get_current_user
+from app.api.auth import get_current_user, get_current_user_async
+from app.core.principals import Principal
+from app.services.reservations import InsufficientStock, reserve_stock, release_stock
 
 router = APIRouter()
 
 @router.get("", response_model=List[schemas.CartItem])
-def get_cart_items(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_cart_items(
+    current_user: Principal = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    cart_items = db.query(models.CartItem).filter(
-        models.CartItem.user_id == current_user.id
-    ).all()
+    # Lines, products and categories in one query; the deferred image BLOB stays out
+    result = await db.execute(
+        select(models.CartItem).options(
+            joinedload(models.CartItem.product).undefer(models.Product.specifications),
+            joinedload(models.CartItem.product).joinedload(models.Product.category)
+        ).filter(
+            models.CartItem.user_id == current_user.id
+        )
+    )
     
-    return cart_items
+    return result.scalars().all()
 
 @router.post("", response_model=schemas.CartItem)
 def add_to_cart(
     cart_item: schemas.CartItemCreate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # Check if product exists and is active
@@ -39,9 +50,18 @@ def add_to_cart(
         models.CartItem.product_id == cart_item.product_id
     ).first()
     
+    quantity = cart_item.quantity + (existing_item.quantity if existing_item else 0)
+    
+    # Hold the stock now so checkout doesn't fail later
+    try:
+        reserve_stock(db, current_user.id, product.id, quantity)
+    except InsufficientStock:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Insufficient stock for {product.name}")
+    
     if existing_item:
         # Update quantity
-        existing_item.quantity += cart_item.quantity
+        existing_item.quantity = quantity
         db.commit()
         db.refresh(existing_item)
         return existing_item
@@ -53,7 +73,12 @@ def add_to_cart(
             quantity=cart_item.quantity
         )
         db.add(db_cart_item)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent request added the same product first
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Cart was updated by another request, please retry")
         db.refresh(db_cart_item)
         return db_cart_item
 
@@ -61,7 +86,7 @@ def add_to_cart(
 def update_cart_item(
     cart_item_id: int,
     quantity: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     cart_item = db.query(models.CartItem).filter(
@@ -73,10 +98,17 @@ def update_cart_item(
         raise HTTPException(status_code=404, detail="Cart item not found")
     
     if quantity <= 0:
+        release_stock(db, current_user.id, cart_item.product_id)
         db.delete(cart_item)
         db.commit()
         return {"message": "Item removed from cart"}
     
+    try:
+        reserve_stock(db, current_user.id, cart_item.product_id, quantity)
+    except InsufficientStock:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Insufficient stock for {cart_item.product.name}")
+    
     cart_item.quantity = quantity
     db.commit()
     db.refresh(cart_item)
@@ -85,7 +117,7 @@ def update_cart_item(
 @router.delete("/{cart_item_id}")
 def remove_from_cart(
     cart_item_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     cart_item = db.query(models.CartItem).filter(
@@ -96,15 +128,17 @@ def remove_from_cart(
     if not cart_item:
         raise HTTPException(status_code=404, detail="Cart item not found")
     
+    release_stock(db, current_user.id, cart_item.product_id)
     db.delete(cart_item)
     db.commit()
     return {"message": "Item removed from cart"}
 
 @router.delete("")
 def clear_cart(
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    release_stock(db, current_user.id)
     db.query(models.CartItem).filter(
         models.CartItem.user_id == current_user.id
     ).delete()
@@ -112,23 +146,26 @@ def clear_cart(
     return {"message": "Cart cleared"}
 
 @router.get("/total")
-def get_cart_total(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_cart_total(
+    current_user: Principal = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    cart_items = db.query(models.CartItem).filter(
-        models.CartItem.user_id == current_user.id
-    ).all()
-    
-    total = 0.0
-    item_count = 0
-    
-    for item in cart_items:
-        total += item.product.price * item.quantity
-        item_count += item.quantity
+    # Aggregate in SQL so the cost doesn't grow with the number of cart lines
+    result = await db.execute(
+        select(
+            func.coalesce(func.sum(models.Product.price * models.CartItem.quantity), 0.0),
+            func.coalesce(func.sum(models.CartItem.quantity), 0),
+            func.count(models.CartItem.id)
+        ).join(
+            models.Product, models.CartItem.product_id == models.Product.id
+        ).filter(
+            models.CartItem.user_id == current_user.id
+        )
+    )
+    total, item_count, lines = result.one()
     
     return {
-        "total_amount": total,
+        "total_amount": float(total),
         "item_count": item_count,
-        "items": len(cart_items)
+        "items": lines
     }
@@ -1,25 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload, undefer
 from typing import List
 import uuid
 from datetime import datetime
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.models import models, schemas
-from app.api.auth import get_current_user
-from app.services.email import email_service
+from app.api.auth import get_current_user, get_current_user_async
+from app.core.principals import Principal
+from app.services.outbox import enqueue_email
+from app.services.reservations import commit_stock
 
 router = APIRouter()
 
 @router.post("", response_model=schemas.Order)
 def create_order(
     order_data: schemas.OrderCreate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Get cart items
-    cart_items = db.query(models.CartItem).filter(
+    # Get cart items with the product columns checkout needs, in one query
+    cart_items = db.query(models.CartItem).options(
+        joinedload(models.CartItem.product).load_only(
+            models.Product.name,
+            models.Product.price
+        )
+    ).filter(
         models.CartItem.user_id == current_user.id
-    ).all()
+    ).order_by(models.CartItem.product_id).all()
     
     if not cart_items:
         raise HTTPException(status_code=400, detail="Cart is empty")
@@ -29,12 +38,6 @@ def create_order(
     order_items_data = []
     
     for cart_item in cart_items:
-        if cart_item.product.stock_quantity < cart_item.quantity:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Insufficient stock for {cart_item.product.name}"
-            )
-        
         item_total = cart_item.product.price * cart_item.quantity
         total_amount += item_total
         
@@ -48,81 +51,100 @@ def create_order(
     # Generate order number
     order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
     
-    # Create order
-    db_order = models.Order(
-        user_id=current_user.id,
-        order_number=order_number,
-        total_amount=total_amount,
-        shipping_address=order_data.shipping_address,
-        billing_address=order_data.billing_address or order_data.shipping_address,
-        payment_method=order_data.payment_method,
-        notes=order_data.notes
-    )
-    
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    
-    # Create order items
-    for item_data in order_items_data:
-        db_order_item = models.OrderItem(
+    # Everything below is one transaction: any failure rolls the whole order back
+    try:
+        db_order = models.Order(
+            user_id=current_user.id,
+            order_number=order_number,
+            total_amount=total_amount,
+            shipping_address=order_data.shipping_address,
+            billing_address=order_data.billing_address or order_data.shipping_address,
+            payment_method=order_data.payment_method,
+            notes=order_data.notes
+        )
+        db.add(db_order)
+        db.flush()
+        
+        # Convert the cart's stock reservations into sales, in product id order so
+        # concurrent checkouts lock rows consistently. Lines whose hold expired
+        # fall back to a guarded decrement against unreserved stock, so two
+        # buyers still can't oversell.
+        for cart_item in cart_items:
+            if not commit_stock(db, current_user.id, cart_item.product_id, cart_item.quantity):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Insufficient stock for {cart_item.product.name}"
+                )
+        
+        # Create order items
+        db.execute(
+            insert(models.OrderItem),
+            [{"order_id": db_order.id, **item_data} for item_data in order_items_data]
+        )
+        
+        # Clear cart
+        db.query(models.CartItem).filter(
+            models.CartItem.user_id == current_user.id
+        ).delete(synchronize_session=False)
+        
+        # Create initial order status record
+        initial_status = models.OrderStatus(
             order_id=db_order.id,
-            **item_data
+            status="pending",
+            updated_by="system"
         )
-        db.add(db_order_item)
+        db.add(initial_status)
         
-        # Update product stock
-        product = db.query(models.Product).filter(
-            models.Product.id == item_data["product_id"]
-        ).first()
-        product.stock_quantity -= item_data["quantity"]
-    
-    # Clear cart
-    db.query(models.CartItem).filter(
-        models.CartItem.user_id == current_user.id
-    ).delete()
-    
-    # Create initial order status record
-    initial_status = models.OrderStatus(
-        order_id=db_order.id,
-        status="pending",
-        updated_by="system"
-    )
-    db.add(initial_status)
-    
-    db.commit()
-    db.refresh(db_order)
-    
-    # Send order confirmation email
-    try:
-        email_service.send_order_confirmation(
-            user_email=current_user.email,
-            user_name=f"{current_user.first_name} {current_user.last_name}",
-            order=db_order
+        # Queue the confirmation email; the outbox worker sends it and sets
+        # confirmation_sent once it's delivered
+        first_name, last_name = db.query(models.User.first_name, models.User.last_name).filter(
+            models.User.id == current_user.id
+        ).one()
+        enqueue_email(
+            db,
+            "order_confirmation",
+            current_user.email,
+            order_id=db_order.id,
+            user_name=f"{first_name} {last_name}"
         )
-        db_order.confirmation_sent = True
+        
         db.commit()
-    except Exception as e:
-        print(f"Failed to send order confirmation email: {e}")
-        # Don't fail order creation if email sending fails
+    except Exception:
+        db.rollback()
+        raise
+    
+    # Reload with items and products for the response
+    db_order = db.query(models.Order).options(
+        selectinload(models.Order.order_items).joinedload(models.OrderItem.product).undefer(
+            models.Product.specifications
+        )
+    ).filter(models.Order.id == db_order.id).one()
     
     return db_order
 
 @router.get("", response_model=List[schemas.Order])
-def get_user_orders(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_user_orders(
+    current_user: Principal = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    orders = db.query(models.Order).filter(
-        models.Order.user_id == current_user.id
-    ).order_by(models.Order.created_at.desc()).all()
+    # Async sessions can't lazy-load, so fetch everything the response nests up front
+    result = await db.execute(
+        select(models.Order).options(
+            selectinload(models.Order.order_items).joinedload(models.OrderItem.product).options(
+                undefer(models.Product.specifications),
+                joinedload(models.Product.category)
+            )
+        ).filter(
+            models.Order.user_id == current_user.id
+        ).order_by(models.Order.created_at.desc())
+    )
     
-    return orders
+    return result.scalars().all()
 
 @router.get("/{order_id}", response_model=schemas.Order)
 def get_order(
     order_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     order = db.query(models.Order).filter(
@@ -139,7 +161,7 @@ def get_order(
 def update_order_status(
     order_id: int,
     status: str,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     # This would typically be admin-only, but for MVP we'll allow users to cancel
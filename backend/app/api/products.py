@@ -1,17 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response, Request, Query
+from fastapi.responses import StreamingResponse, FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, undefer, load_only
 from typing import List, Optional
 import io
 import json
-from app.core.database import get_db
+from PIL import UnidentifiedImageError
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from app.core.database import get_db, get_read_db, get_async_read_db
+from app.core.pagination import apply_keyset, next_cursor
 from app.models import models, schemas
 from app.api.auth import get_current_user
+from app.core.principals import Principal
+from app.services.search import apply_product_search, is_ranked_search, render_snippet
+from app.services.storage import image_store, ImageTooLarge, MAX_IMAGE_UPLOAD_MB
+from app.services.images import (
+    DERIVATIVE_FORMATS, IMAGE_MAX_PIXELS, ImageTooManyPixels, check_image_dimensions,
+    derivative_cache, negotiate_format, schedule_derivatives, sniff_image_type, snap_width
+)
 
 router = APIRouter()
 
 @router.get("/categories")
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(db: Session = Depends(get_read_db)):
     """Get all product categories"""
     try:
         categories = db.query(models.Category).all()
@@ -32,7 +45,7 @@ def get_categories(db: Session = Depends(get_db)):
 def create_category(
     category: schemas.CategoryCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     db_category = models.Category(**category.dict())
     db.add(db_category)
@@ -40,49 +53,88 @@ def create_category(
     db.refresh(db_category)
     return db_category
 
+# Keyset sort orders for the catalogue; each ends in the primary key so the order is total
+PRODUCT_SORTS = {
+    "newest": [(models.Product.created_at, True), (models.Product.id, True)],
+    "price_asc": [(models.Product.price, False), (models.Product.id, False)],
+    "price_desc": [(models.Product.price, True), (models.Product.id, True)],
+}
+
 @router.get("", response_model=List[schemas.Product])
-def get_products(
+async def get_products(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
     category_id: Optional[int] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    include_specifications: bool = Query(False, description="Also return each product's specifications (null otherwise)"),
+    sort: Optional[str] = Query(None, regex="^(newest|price_asc|price_desc)$"),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    query = db.query(models.Product).filter(models.Product.is_active == True)
+    """List active products.
+    
+    Pages continue from the X-Next-Cursor response header (pass it back as
+    ?cursor=); skip/limit offset paging is still accepted. A full-text search
+    without an explicit sort is ordered by relevance and only pages by offset.
+    """
+    query = select(models.Product).filter(models.Product.is_active == True)
+    
+    # specifications is deferred on the mapping; only load it when asked for
+    if include_specifications:
+        query = query.options(undefer(models.Product.specifications))
     
     if category_id:
         query = query.filter(models.Product.category_id == category_id)
     
+    # Full-text search (BM25-ranked) when available, LIKE otherwise
+    ranked = is_ranked_search(search) and sort is None and cursor is None
+    snippet = None
     if search:
-        query = query.filter(
-            models.Product.name.contains(search) |
-            models.Product.description.contains(search) |
-            models.Product.brand.contains(search)
-        )
+        query, snippet = apply_product_search(query, search, order_by_rank=ranked)
+        if snippet is not None:
+            query = query.add_columns(snippet)
     
-    products = query.offset(skip).limit(limit).all()
+    if ranked:
+        query = query.offset(skip).limit(limit)
+    else:
+        sort_key = PRODUCT_SORTS[sort or "newest"]
+        query = apply_keyset(query, sort_key, cursor, dialect=db.bind.dialect.name)
+        query = (query if cursor else query.offset(skip)).limit(limit)
+    
+    result = await db.execute(query)
+    rows = result.all() if snippet is not None else result.scalars().all()
+    
+    if not ranked:
+        cursor_value = next_cursor(rows, sort_key, limit, get=(lambda row: row[0]) if snippet is not None else None)
+        if cursor_value:
+            response.headers["X-Next-Cursor"] = cursor_value
     
     # Convert to response model with image check
     result = []
-    for product in products:
+    for row in rows:
+        product, search_snippet = row if snippet is not None else (row, None)
         product_dict = {
             "id": product.id,
             "name": product.name,
             "description": product.description,
             "price": product.price,
             "stock_quantity": product.stock_quantity,
+            "available_quantity": product.available_quantity,
             "category_id": product.category_id,
             "brand": product.brand,
             "model": product.model,
-            "specifications": product.specifications,
+            "specifications": product.specifications if include_specifications else None,
             "is_active": product.is_active,
             "created_at": product.created_at,
             "updated_at": product.updated_at,
-            "has_image": product.image_data is not None
+            "has_image": product.has_image,
+            "image_version": product.image_version,
+            "search_snippet": render_snippet(search_snippet)
         }
         
         # Handle specifications - keep as string for Pydantic validation
-        if product.specifications:
+        if include_specifications and product.specifications:
             if isinstance(product.specifications, dict):
                 product_dict["specifications"] = json.dumps(product.specifications)
             else:
@@ -93,11 +145,16 @@ def get_products(
     return result
 
 @router.get("/{product_id}", response_model=schemas.Product)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(
-        models.Product.id == product_id,
-        models.Product.is_active == True
-    ).first()
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    result = await db.execute(
+        select(models.Product).options(
+            undefer(models.Product.specifications)
+        ).filter(
+            models.Product.id == product_id,
+            models.Product.is_active == True
+        )
+    )
+    product = result.scalars().first()
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -109,6 +166,7 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
         "description": product.description,
         "price": product.price,
         "stock_quantity": product.stock_quantity,
+        "available_quantity": product.available_quantity,
         "category_id": product.category_id,
         "brand": product.brand,
         "model": product.model,
@@ -116,7 +174,8 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
         "is_active": product.is_active,
         "created_at": product.created_at,
         "updated_at": product.updated_at,
-        "has_image": product.image_data is not None
+        "has_image": product.has_image,
+        "image_version": product.image_version
     }
     
     # Parse specifications if it's a JSON string
@@ -132,7 +191,7 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
 def create_product(
     product: schemas.ProductCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # Convert specifications to JSON string if it's a dict
     product_data = product.dict()
@@ -145,7 +204,7 @@ def create_product(
     db.refresh(db_product)
     
     return schemas.Product(
-        **{**db_product.__dict__, "has_image": False}
+        **{**db_product.__dict__, "specifications": product_data.get("specifications"), "has_image": False}
     )
 
 @router.post("/{product_id}/image")
@@ -153,37 +212,149 @@ def upload_product_image(
     product_id: int,
     image: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Validate image type
-    if not image.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
+    # Validate image type from the file's magic bytes, not the client-supplied content_type
+    content_type = sniff_image_type(image.file.read(16))
+    if content_type is None:
+        raise HTTPException(status_code=400, detail="File must be a JPEG, PNG, GIF or WebP image")
+    image.file.seek(0)
     
-    # Read image data
-    image_data = image.file.read()
+    # Refuse decompression bombs before they are stored or resized
+    try:
+        check_image_dimensions(image.file)
+    except ImageTooManyPixels:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image must be at most {IMAGE_MAX_PIXELS // 1000000} megapixels"
+        )
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=400, detail="File is not a readable image")
+    
+    # Stream into the content-addressed image store in fixed-size chunks; the row only keeps the key
+    try:
+        image_key, _ = image_store.put_stream(image.file)
+    except ImageTooLarge:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image must be smaller than {MAX_IMAGE_UPLOAD_MB} MB"
+        )
     
-    # Store image in database (for MVP - migrate to cloud storage later)
-    product.image_data = image_data
+    product.image_key = image_key
+    product.image_data = None
     product.image_filename = image.filename
-    product.image_content_type = image.content_type
+    product.image_content_type = content_type
+    product.image_uploaded_at = datetime.utcnow()
     
     db.commit()
     
-    return {"message": "Image uploaded successfully"}
+    # Thumbnails and responsive sizes are rendered off the request path
+    schedule_derivatives(product.image_key)
+    
+    return {"message": "Image uploaded successfully", "image_version": product.image_version}
+
+# Versioned image URLs (?v=<image_version>) never change content, so they can be
+# cached forever; unversioned URLs must be revalidated with the ETag.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+def _image_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the stored validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence and uses weak comparison (RFC 9110 13.1.2)
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    
+    return False
 
 @router.get("/{product_id}/image")
-def get_product_image(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+def get_product_image(
+    product_id: int,
+    request: Request,
+    v: Optional[str] = None,
+    w: Optional[int] = Query(None, ge=1, le=4096),
+    db: Session = Depends(get_read_db)
+):
+    # Only the image metadata is loaded; the validators come from the row
+    product = db.query(models.Product).options(
+        load_only(
+            models.Product.has_image,
+            models.Product.image_key,
+            models.Product.image_filename,
+            models.Product.image_content_type,
+            models.Product.image_uploaded_at
+        )
+    ).filter(models.Product.id == product_id).first()
     
-    if not product or not product.image_data:
+    if not product or not product.has_image:
         raise HTTPException(status_code=404, detail="Image not found")
     
+    headers = {"Content-Disposition": f"inline; filename={product.image_filename}"}
+    
+    if product.image_key:
+        last_modified = None
+        if product.image_uploaded_at:
+            last_modified = product.image_uploaded_at.replace(tzinfo=timezone.utc)
+        
+        headers["ETag"] = f'"{product.image_key}"'
+        headers["Cache-Control"] = (
+            IMMUTABLE_CACHE_CONTROL if v and v == product.image_version else REVALIDATE_CACHE_CONTROL
+        )
+        if last_modified:
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+        
+        if w:
+            # Resized derivative: one cache entry per (content, size, format)
+            fmt = negotiate_format(request.headers.get("accept"))
+            width = snap_width(w)
+            derivative_headers = {
+                **headers,
+                "ETag": f'"{product.image_key}-{width}.{fmt}"',
+                "Vary": "Accept"
+            }
+            if _image_not_modified(request, derivative_headers["ETag"], last_modified):
+                derivative_headers.pop("Content-Disposition")
+                return Response(status_code=304, headers=derivative_headers)
+            
+            path = derivative_cache.get_or_create(product.image_key, width, fmt)
+            if path:
+                return FileResponse(path, media_type=DERIVATIVE_FORMATS[fmt][1], headers=derivative_headers)
+            # Not a format Pillow can resize - fall back to the original upload
+        
+        if _image_not_modified(request, headers["ETag"], last_modified):
+            headers.pop("Content-Disposition")
+            return Response(status_code=304, headers=headers)
+        
+        if not image_store.exists(product.image_key):
+            raise HTTPException(status_code=404, detail="Image not found")
+        
+        path = image_store.local_path(product.image_key)
+        if path:
+            return FileResponse(path, media_type=product.image_content_type, headers=headers)
+        return StreamingResponse(
+            image_store.open(product.image_key),
+            media_type=product.image_content_type,
+            headers=headers
+        )
+    
+    # Legacy rows not yet moved out by migrate_images_to_store.py (no stored hash, so no validators)
     return StreamingResponse(
         io.BytesIO(product.image_data),
         media_type=product.image_content_type,
-        headers={"Content-Disposition": f"inline; filename={product.image_filename}"}
+        headers=headers
     )
@@ -5,6 +5,7 @@ from datetime import datetime
 from app.core.database import get_db
 from app.models import models, schemas
 from app.api.auth import get_current_user
+from app.core.principals import Principal
 
 router = APIRouter()
 
@@ -85,7 +86,7 @@ def get_faq():
 
 @router.get("/support-tickets")
 def get_support_tickets(
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get user's support tickets"""
@@ -0,0 +1,74 @@
+import os
+from dotenv import load_dotenv
+from starlette.responses import JSONResponse
+from app.services.storage import MAX_IMAGE_UPLOAD_MB
+
+load_dotenv()
+
+# Largest request body accepted by any endpoint. Image uploads are the biggest
+# legitimate bodies, so the default leaves MAX_IMAGE_UPLOAD_MB plus room for the
+# multipart framing. Anything larger is refused before the form parser spools it.
+MAX_REQUEST_BODY_MB = int(os.getenv("MAX_REQUEST_BODY_MB", str(MAX_IMAGE_UPLOAD_MB + 1)))
+
+
+class BodySizeLimitMiddleware:
+    """Answer 413 as soon as a request body is known to exceed max_bytes.
+
+    A declared Content-Length is checked before anything is read; chunked
+    bodies are counted as they arrive, and the app sees a disconnect once the
+    limit is crossed.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BODY_MB * 1024 * 1024):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def _too_large(self) -> JSONResponse:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body must be smaller than {self.max_bytes // (1024 * 1024)} MB"}
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._too_large()(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    rejected = True
+                    if not response_started:
+                        await self._too_large()(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # The app gave up on the truncated body; the 413 has already been sent
+            if not rejected:
+                raise
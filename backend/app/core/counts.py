@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from itertools import chain
+from typing import Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.orm import Query, Session
+
+load_dotenv()
+
+# Totals for admin listings are cached per filter signature for a short TTL and
+# dropped as soon as this process commits a write to one of their tables.
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "1024"))
+
+# Values accepted by the ?count= parameter on admin listings
+COUNT_MODES = ("exact", "estimate", "none")
+
+
+class CountCache:
+    """Bounded TTL cache of query counts, invalidated per table"""
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL, max_entries: int = COUNT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, generations, count)
+        self._generations = defaultdict(int)
+
+    def generations(self, tables: Sequence[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._generations[table] for table in tables)
+
+    def get(self, key, tables: Sequence[str]) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, generations, count = entry
+            current = tuple(self._generations[table] for table in tables)
+            if expires_at < time.monotonic() or generations != current:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return count
+
+    def set(self, key, generations: Tuple[int, ...], count: int):
+        # generations are captured *before* counting, so a write that lands
+        # while the count runs leaves this entry already stale
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, generations, count)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tables: str):
+        with self._lock:
+            for table in tables:
+                self._generations[table] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Global count cache instance
+count_cache = CountCache()
+
+
+def _signature(query: Query):
+    compiled = query.statement.compile()
+    return str(compiled), tuple(sorted((name, repr(value)) for name, value in compiled.params.items()))
+
+
+def _estimate(query: Query) -> Optional[int]:
+    """Planner row estimate (PostgreSQL only); None where the database has no cheap estimate"""
+    bind = query.session.get_bind()
+    if bind.dialect.name != "postgresql":
+        return None
+    compiled = query.order_by(None).statement.compile(dialect=bind.dialect)
+    plan = query.session.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_query(query: Query, tables: Sequence[str], mode: str = "exact") -> Optional[int]:
+    """Total rows for a listing query.
+
+    exact    - COUNT(*), cached per filter signature until TTL expiry or a write to `tables`
+    estimate - the query planner's estimate where available, else the cached exact count
+    none     - no total at all (callers report has_more instead)
+    """
+    if mode == "none":
+        return None
+
+    if mode == "estimate":
+        estimate = _estimate(query)
+        if estimate is not None:
+            return estimate
+
+    key = _signature(query)
+    count = count_cache.get(key, tables)
+    if count is not None:
+        return count
+
+    generations = count_cache.generations(tables)
+    count = query.order_by(None).count()
+    count_cache.set(key, generations, count)
+    return count
+
+
+# Invalidation: collect the tables each session writes to and bump their
+# generation once the transaction commits (nothing happens on rollback).
+
+def _written_tables(session: Session) -> set:
+    return session.info.setdefault("count_cache_tables", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_tables(session, flush_context):
+    tables = _written_tables(session)
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            tables.add(table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_tables(orm_execute_state):
+    # Bulk query.update() / query.delete() / insert() bypass the flush
+    if (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert) \
+            and orm_execute_state.bind_mapper is not None:
+        _written_tables(orm_execute_state.session).add(orm_execute_state.bind_mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_tables(session):
+    tables = session.info.pop("count_cache_tables", None)
+    if tables:
+        count_cache.invalidate(*tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_tables(session):
+    session.info.pop("count_cache_tables", None)
@@ -1,34 +1,270 @@
+import hashlib
+import itertools
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# SQLite database URL (explicitly set for MVP)
-DATABASE_URL = "sqlite:///./electronics_store.db"
+# SQLite for development; any SQLAlchemy URL (e.g. postgresql://...) works
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./electronics_store.db")
 
-# Override only if explicitly set in environment
-env_db_url = os.getenv("DATABASE_URL")
-if env_db_url and env_db_url.startswith("sqlite://"):
-    DATABASE_URL = env_db_url
+# Connection pool (per worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
 
-print(f"Using database: {DATABASE_URL}")  # Debug print
+# Optional read replicas (comma-separated URLs) for endpoints using get_read_db.
+# A client that just wrote keeps reading from the primary for
+# READ_YOUR_WRITES_SECONDS; a replica that fails to connect is skipped for
+# REPLICA_RETRY_SECONDS.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+RECENT_WRITERS_SIZE = 10000
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=False  # Set to True for debugging SQL queries
-)
+# SQLite tuning. WAL lets readers run alongside a writer, and busy_timeout makes
+# a blocked writer wait instead of failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+
+# asyncio drivers used by the async session path (get_async_db)
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    finally:
+        cursor.close()
+
+
+def async_database_url(database_url: str):
+    """The same database, addressed through its asyncio driver"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def create_db_engine(database_url: str, asynchronous: bool = False, **kwargs):
+    """Engine with pool settings for the URL's backend and SQLite pragmas where relevant.
+
+    With asynchronous=True this is an AsyncEngine on the backend's asyncio driver.
+    """
+    url = async_database_url(database_url) if asynchronous else make_url(database_url)
+    options = {"echo": False}  # Set echo=True for debugging SQL queries
+
+    if url.get_backend_name() == "sqlite":
+        if not asynchronous:
+            options["connect_args"] = {"check_same_thread": False}
+        if not _is_memory_sqlite(url):
+            options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+            if asynchronous:
+                # aiosqlite would otherwise default to NullPool (a new connection per session)
+                options["poolclass"] = AsyncAdaptedQueuePool
+    else:
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            # Server connections can be dropped while idle in the pool
+            pool_pre_ping=True
+        )
+
+    options.update(kwargs)
+    if asynchronous:
+        engine = create_async_engine(url, **options)
+        events_target = engine.sync_engine
+    else:
+        engine = events_target = create_engine(url, **options)
+
+    if url.get_backend_name() == "sqlite" and not _is_memory_sqlite(url):
+        event.listen(events_target, "connect", _set_sqlite_pragmas)
+
+    return engine
+
+
+engine = create_db_engine(DATABASE_URL)
+print(f"Using database: {engine.url.render_as_string(hide_password=True)}")  # Debug print
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine on the same database, for endpoints declared with async def
+async_engine = create_db_engine(DATABASE_URL, asynchronous=True)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+class ReplicaRouter:
+    """Hands out read sessions on replicas, round-robin, falling back to the primary"""
+
+    def __init__(self, replica_urls):
+        self.sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, bind=create_db_engine(url))
+            for url in replica_urls
+        ]
+        self.async_sessionmakers = [
+            async_sessionmaker(create_db_engine(url, asynchronous=True), autoflush=False, expire_on_commit=False)
+            for url in replica_urls
+        ]
+        self._down_until = [0.0] * len(self.sessionmakers)
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._recent_writers = OrderedDict()  # client key -> monotonic time of last write
+
+    def note_write(self, client_key: Optional[str]):
+        if not client_key or not self.sessionmakers:
+            return
+        with self._lock:
+            self._recent_writers[client_key] = time.monotonic()
+            self._recent_writers.move_to_end(client_key)
+            while len(self._recent_writers) > RECENT_WRITERS_SIZE:
+                self._recent_writers.popitem(last=False)
+
+    def wrote_recently(self, client_key: Optional[str]) -> bool:
+        if not client_key:
+            return False
+        with self._lock:
+            written_at = self._recent_writers.get(client_key)
+        return written_at is not None and time.monotonic() - written_at < READ_YOUR_WRITES_SECONDS
+
+    def _candidates(self, client_key: Optional[str]):
+        """Replica indexes to try, in round-robin order; empty means use the primary"""
+        if not self.sessionmakers or self.wrote_recently(client_key):
+            return []
+        start = next(self._turn)
+        count = len(self.sessionmakers)
+        now = time.monotonic()
+        return [
+            index for index in ((start + offset) % count for offset in range(count))
+            if self._down_until[index] <= now
+        ]
+
+    def _mark_down(self, index: int, error: Exception):
+        self._down_until[index] = time.monotonic() + REPLICA_RETRY_SECONDS
+        print(f"Read replica {index} unavailable, using primary: {error}")
+
+    def session(self, client_key: Optional[str] = None) -> Session:
+        for index in self._candidates(client_key):
+            db = self.sessionmakers[index]()
+            try:
+                db.connection()
+                return db
+            except DBAPIError as e:
+                db.close()
+                self._mark_down(index, e)
+
+        return SessionLocal()
+
+    async def async_session(self, client_key: Optional[str] = None) -> AsyncSession:
+        for index in self._candidates(client_key):
+            db = self.async_sessionmakers[index]()
+            try:
+                await db.connection()
+                return db
+            except DBAPIError as e:
+                await db.close()
+                self._mark_down(index, e)
+
+        return AsyncSessionLocal()
+
+
+# Global replica router instance
+replica_router = ReplicaRouter(DATABASE_REPLICA_URLS)
+
+
+def client_key(request: Request) -> Optional[str]:
+    """Who is asking: the bearer token (hashed) or, for anonymous requests, the client address"""
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return hashlib.sha256(authorization.encode()).hexdigest()
+    return request.client.host if request.client else None
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_written(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_written(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _note_committed_write(session):
+    # Recorded before the response goes out, so the client's next read sees it
+    if session.info.pop("wrote", False):
+        replica_router.note_write(session.info.get("client_key"))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_write(session):
+    session.info.pop("wrote", None)
+
+
 # Dependency to get database session
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    db.info["client_key"] = client_key(request)
     try:
         yield db
     finally:
         db.close()
+
+# Dependency for read-only endpoints: a replica session when one is configured
+def get_read_db(request: Request):
+    db = replica_router.session(client_key(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async counterparts of get_db / get_read_db
+async def get_async_db(request: Request):
+    db = AsyncSessionLocal()
+    db.info["client_key"] = client_key(request)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+async def get_async_read_db(request: Request):
+    db = await replica_router.async_session(client_key(request))
+    try:
+        yield db
+    finally:
+        await db.close()
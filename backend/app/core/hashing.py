@@ -0,0 +1,94 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from app.core.security import get_password_hash, verify_and_update_password
+
+load_dotenv()
+
+# PBKDF2 is tens of milliseconds of pure CPU per call. Login and registration
+# hand it to a process pool so it neither holds the GIL nor ties up the
+# threadpool that serves everything else. At most PASSWORD_HASH_QUEUE hashes
+# may be running or waiting; beyond that callers are turned away.
+#
+# The pool is per server process: `uvicorn --workers N` starts N times
+# PASSWORD_HASH_WORKERS hashing processes, hence the small default. The pool
+# uses spawn, so each hashing process re-imports the launching script as
+# __mp_main__; scripts that start the app (directly or through TestClient)
+# must keep that under `if __name__ == "__main__":`.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", str(PASSWORD_HASH_WORKERS * 4)))
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+    pass
+
+
+class PasswordHasher:
+    """Bounded process pool for password hashing and verification"""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = None
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that already runs threads can copy held locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise PasswordHasherBusy(f"{self._pending} password hashes already queued")
+            self._pending += 1
+        try:
+            return await asyncio.wrap_future(self._get_executor().submit(fn, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new hash); see verify_and_update_password"""
+        return await self._run(verify_and_update_password, password, hashed_password)
+
+    def start(self):
+        """Start the worker processes now rather than on the first login"""
+        executor = self._get_executor()
+        try:
+            for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+        except BrokenProcessPool:
+            raise RuntimeError(
+                "Password hashing processes failed to start; the script that launched the app "
+                "must guard its startup code with `if __name__ == \"__main__\":`"
+            )
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Global password hasher instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,75 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy import String, tuple_, type_coerce
+from sqlalchemy.orm import Query
+
+# Keyset ("cursor") pagination: each page continues strictly after the last row
+# of the previous one, so deep pages cost the same as the first and rows
+# inserted while someone is paging don't shift results.
+#
+# A sort key is a list of (column, descending) pairs that must end in a unique
+# column (the primary key) so the order is total.
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Opaque, URL-safe cursor for the given sort key values"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: List[Tuple]) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(sort_key):
+            raise ValueError("cursor does not match sort order")
+        return [
+            datetime.fromisoformat(value) if column.type.python_type is datetime and value is not None else value
+            for value, (column, _) in zip(values, sort_key)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def _comparable(column, value, dialect: str):
+    # SQLite stores server_default CURRENT_TIMESTAMP values as text without
+    # fractional seconds, while SQLAlchemy binds datetimes with microseconds.
+    # Compare datetimes as text in the stored format so ties compare equal.
+    if dialect == "sqlite" and isinstance(value, datetime):
+        text_value = value.strftime("%Y-%m-%d %H:%M:%S")
+        if value.microsecond:
+            text_value += f".{value.microsecond:06d}"
+        return type_coerce(column, String), text_value
+    return column, value
+
+
+def apply_keyset(query: Query, sort_key: List[Tuple], cursor: Optional[str], dialect: Optional[str] = None) -> Query:
+    """Order the query by the sort key and, given a cursor, continue after it.
+
+    Works on legacy Query objects and on select() statements; the latter have
+    no session, so pass the database dialect name along with them.
+    """
+    descending = sort_key[0][1]
+    if any(column_descending != descending for _, column_descending in sort_key):
+        raise ValueError("Keyset sort keys must use a single direction")
+
+    if cursor:
+        values = decode_cursor(cursor, sort_key)
+        dialect = dialect or query.session.get_bind().dialect.name
+        pairs = [_comparable(column, value, dialect) for (column, _), value in zip(sort_key, values)]
+        columns = tuple_(*[column for column, _ in pairs])
+        bound = tuple_(*[value for _, value in pairs])
+        query = query.filter(columns < bound if descending else columns > bound)
+
+    return query.order_by(*[column.desc() if desc else column.asc() for column, desc in sort_key])
+
+
+def next_cursor(rows: list, sort_key: List[Tuple], limit: int, get=None) -> Optional[str]:
+    """Cursor for the page after `rows`, or None when this was the last page"""
+    if len(rows) < limit:
+        return None
+    last = get(rows[-1]) if get else rows[-1]
+    return encode_cursor([getattr(last, column.key) for column, _ in sort_key])
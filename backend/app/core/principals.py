@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.models import models
+
+load_dotenv()
+
+# Authenticated requests resolve their token subject to a slim principal that is
+# cached for a short TTL instead of loading the User row every time. Entries are
+# dropped as soon as a transaction that changed the user commits; with several
+# workers, PRINCIPAL_CACHE_URL (redis://...) shares the cache, and with it the
+# invalidation, between them. Without it other workers catch up within the TTL.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_URL = os.getenv("PRINCIPAL_CACHE_URL", "")
+
+
+class Principal:
+    """The part of a User that authentication and authorization need"""
+
+    __slots__ = ("id", "email", "is_admin", "is_active")
+
+    def __init__(self, id: int, email: str, is_admin: bool, is_active: bool):
+        self.id = id
+        self.email = email
+        self.is_admin = bool(is_admin)
+        self.is_active = bool(is_active)
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(user.id, user.email, user.is_admin, user.is_active)
+
+    def to_json(self) -> str:
+        return json.dumps({name: getattr(self, name) for name in self.__slots__})
+
+    @classmethod
+    def from_json(cls, data) -> "Principal":
+        return cls(**json.loads(data))
+
+
+class PrincipalCache:
+    """Bounded in-process TTL cache of principals, keyed by token subject (email)"""
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_entries: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # subject -> (expires_at, principal)
+        self._generation = 0
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def get(self, subject: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[subject]
+                return None
+            self._entries.move_to_end(subject)
+            return principal
+
+    def set(self, subject: str, principal: Principal, generation: int):
+        # generation is captured before the user is loaded; if anything was
+        # invalidated meanwhile the loaded row may already be stale, so skip it
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[subject] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *subjects: str):
+        with self._lock:
+            self._generation += 1
+            for subject in subjects:
+                self._entries.pop(subject, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class RedisPrincipalCache(PrincipalCache):
+    """Principal cache shared by all workers through Redis (needs `pip install redis`)"""
+
+    key_prefix = "principal:"
+
+    def __init__(self, url: str, ttl: float = PRINCIPAL_CACHE_TTL):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PRINCIPAL_CACHE_URL is set but the redis package is not installed")
+        super().__init__(ttl=ttl)
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, subject: str) -> Optional[Principal]:
+        data = self.client.get(self.key_prefix + subject)
+        return Principal.from_json(data) if data else None
+
+    def set(self, subject: str, principal: Principal, generation: int):
+        # Invalidations from other workers aren't visible here; the TTL bounds that race
+        if generation == self.generation():
+            self.client.set(self.key_prefix + subject, principal.to_json(), px=int(self.ttl * 1000))
+
+    def invalidate(self, *subjects: str):
+        super().invalidate(*subjects)
+        if subjects:
+            self.client.delete(*(self.key_prefix + subject for subject in subjects))
+
+    def clear(self):
+        super().clear()
+        for key in self.client.scan_iter(self.key_prefix + "*"):
+            self.client.delete(key)
+
+
+def _create_principal_cache() -> PrincipalCache:
+    if PRINCIPAL_CACHE_URL:
+        return RedisPrincipalCache(PRINCIPAL_CACHE_URL)
+    return PrincipalCache()
+
+
+# Global principal cache instance
+principal_cache = _create_principal_cache()
+
+
+# Invalidation: collect the emails (old and new) of users written in a session
+# and drop them once the transaction commits. Bulk query.update() on users
+# bypasses this and relies on the TTL.
+
+def _changed_subjects(session: Session) -> set:
+    return session.info.setdefault("principal_cache_subjects", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    subjects = _changed_subjects(session)
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.User):
+            history = inspect(obj).attrs.email.history
+            subjects.update(email for email in (*history.deleted, obj.email) if email)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    subjects = session.info.pop("principal_cache_subjects", None)
+    if subjects:
+        principal_cache.invalidate(*subjects)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_users(session):
+    session.info.pop("principal_cache_subjects", None)
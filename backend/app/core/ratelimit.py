@@ -0,0 +1,121 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Login and registration are throttled per client address and per email before
+# any password hashing happens, so credential stuffing is turned away for the
+# price of a dictionary lookup. Limits are attempts per sliding window. The
+# counters live in each worker process unless RATE_LIMIT_URL (redis://...)
+# points them at a shared store.
+AUTH_RATE_LIMIT_PER_IP = int(os.getenv("AUTH_RATE_LIMIT_PER_IP", "20"))
+LOGIN_RATE_LIMIT_PER_EMAIL = int(os.getenv("LOGIN_RATE_LIMIT_PER_EMAIL", "5"))
+AUTH_RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("AUTH_RATE_LIMIT_WINDOW_SECONDS", "60"))
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "")
+RATE_LIMIT_MAX_KEYS = 100000
+
+# Failed logins before an account is locked, and for how long. Failures count
+# towards the lock only while each comes within LOGIN_LOCKOUT_MINUTES of the
+# previous one (users.login_attempts / last_failed_login / account_locked_until)
+LOGIN_MAX_FAILED_ATTEMPTS = int(os.getenv("LOGIN_MAX_FAILED_ATTEMPTS", "5"))
+LOGIN_LOCKOUT_MINUTES = int(os.getenv("LOGIN_LOCKOUT_MINUTES", "15"))
+
+
+class SlidingWindowLimiter:
+    """At most `limit` hits per key in any `window` seconds (sliding window counter).
+
+    Keeps two counters per key, the current and the previous fixed window, and
+    weights the previous one by how much of it still overlaps the sliding
+    window. Memory is bounded by evicting the least recently seen keys.
+    """
+
+    def __init__(self, name: str, limit: int, window: float = AUTH_RATE_LIMIT_WINDOW_SECONDS,
+                 max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> [window index, count in it, count in the one before]
+
+    def _estimate(self, now: float, current: int, previous: int) -> float:
+        overlap = 1 - (now % self.window) / self.window
+        return previous * overlap + current
+
+    def _retry_after(self, now: float) -> int:
+        # Conservative: the start of the next fixed window
+        return max(1, math.ceil(self.window - now % self.window))
+
+    def hit(self, key: str) -> int:
+        """Count an attempt; returns 0 if allowed, else seconds to wait (the attempt isn't counted)"""
+        now = time.monotonic()
+        index = int(now // self.window)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < index - 1:
+                entry = [index, 0, 0]
+            elif entry[0] == index - 1:
+                entry = [index, 0, entry[1]]
+
+            if self._estimate(now, entry[1], entry[2]) >= self.limit:
+                self._entries[key] = entry
+                return self._retry_after(now)
+
+            entry[1] += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+            return 0
+
+    def reset(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisSlidingWindowLimiter(SlidingWindowLimiter):
+    """The same limiter with its counters in Redis, shared by all workers (needs `pip install redis`)"""
+
+    def __init__(self, url: str, name: str, limit: int, window: float = AUTH_RATE_LIMIT_WINDOW_SECONDS):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_URL is set but the redis package is not installed")
+        super().__init__(name, limit, window)
+        self.client = redis.Redis.from_url(url)
+
+    def _key(self, key: str, index: int) -> str:
+        return f"ratelimit:{self.name}:{key}:{index}"
+
+    def hit(self, key: str) -> int:
+        # Wall-clock time, so every worker agrees on the window boundaries
+        now = time.time()
+        index = int(now // self.window)
+        current, previous = self.client.mget(self._key(key, index), self._key(key, index - 1))
+        if self._estimate(now, int(current or 0), int(previous or 0)) >= self.limit:
+            return self._retry_after(now)
+
+        pipeline = self.client.pipeline()
+        pipeline.incr(self._key(key, index))
+        pipeline.expire(self._key(key, index), int(self.window * 2))
+        pipeline.execute()
+        return 0
+
+    def reset(self, key: str):
+        index = int(time.time() // self.window)
+        self.client.delete(self._key(key, index), self._key(key, index - 1))
+
+
+def _create_limiter(name: str, limit: int) -> SlidingWindowLimiter:
+    if RATE_LIMIT_URL:
+        return RedisSlidingWindowLimiter(RATE_LIMIT_URL, name, limit)
+    return SlidingWindowLimiter(name, limit)
+
+
+# Global rate limiter instances
+auth_ip_limiter = _create_limiter("auth-ip", AUTH_RATE_LIMIT_PER_IP)
+login_email_limiter = _create_limiter("login-email", LOGIN_RATE_LIMIT_PER_EMAIL)
@@ -0,0 +1,59 @@
+import os
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The schema is managed by versioned migrations (backend/migrations), applied
+# with `alembic upgrade head` before the app starts. Startup only checks that
+# the database is at the latest revision. DB_AUTO_MIGRATE=true applies pending
+# migrations at startup instead, which is handy in development but racy with
+# several workers.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "false").lower() == "true"
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "alembic.ini")
+
+
+class SchemaOutOfDate(Exception):
+    """Raised when the database is not at the latest migration"""
+    pass
+
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    # Resolve script_location against the ini file, not the working directory
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def schema_revisions(engine):
+    """(current revisions in the database, head revisions of the migration scripts)"""
+    heads = set(ScriptDirectory.from_config(alembic_config()).get_heads())
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    return current, heads
+
+
+def upgrade_schema():
+    command.upgrade(alembic_config(), "head")
+
+
+def check_schema(engine):
+    """Fail fast unless the database is at the latest migration (one small query)"""
+    current, heads = schema_revisions(engine)
+    if current == heads:
+        return
+
+    if DB_AUTO_MIGRATE:
+        print(f"Migrating database from {sorted(current) or 'empty'} to {sorted(heads)}")
+        upgrade_schema()
+        return
+
+    raise SchemaOutOfDate(
+        f"Database schema is at {sorted(current) or 'no revision'}, expected {sorted(heads)}. "
+        "Run `alembic upgrade head` in the backend directory."
+    )
@@ -1,12 +1,18 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 from app.api import auth, products, cart, orders, support, admin
-from app.core.database import engine
-from app.models import models
-
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+from app.core.body_limit import BodySizeLimitMiddleware
+from app.core.database import engine, async_engine
+from app.core.hashing import password_hasher
+from app.core.schema import check_schema
+from app.services.search import detect_product_search
+from app.services.reservations import run_reservation_sweeper
+from app.services.outbox import run_email_worker
+from app.services.refresh_tokens import run_refresh_token_purger
+from app.services.email import email_service
 
 app = FastAPI(
     title="Electronics Store API",
@@ -16,6 +22,9 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Oversized bodies are refused before they are parsed (added first so CORS still wraps the 413)
+app.add_middleware(BodySizeLimitMiddleware)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -23,8 +32,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.on_event("startup")
+def check_database():
+    # Tables are created by `alembic upgrade head`, not by the app
+    check_schema(engine)
+    # Full-text search index for products (SQLite FTS5)
+    detect_product_search(engine)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.background_tasks = [
+        # Releases cart stock reservations once their TTL runs out
+        asyncio.create_task(run_reservation_sweeper()),
+        # Delivers queued email from the outbox
+        asyncio.create_task(run_email_worker()),
+        # Deletes expired refresh tokens
+        asyncio.create_task(run_refresh_token_purger()),
+    ]
+    # Spawn the password hashing processes before the first login needs them
+    await run_in_threadpool(password_hasher.start)
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in app.state.background_tasks:
+        task.cancel()
+    email_service.pool.close()
+    password_hasher.shutdown()
+    await async_engine.dispose()
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(products.router, prefix="/api/products", tags=["Products"])
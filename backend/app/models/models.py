@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, LargeBinary, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, LargeBinary, ForeignKey, Boolean, Index, UniqueConstraint
+from sqlalchemy import or_, text
+from sqlalchemy.orm import relationship, deferred, column_property
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination order (see app/core/pagination.py)
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -25,6 +30,7 @@ class User(Base):
     # Security fields
     last_login = Column(DateTime, nullable=True)
     login_attempts = Column(Integer, default=0)
+    last_failed_login = Column(DateTime, nullable=True)
     account_locked_until = Column(DateTime, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -45,34 +51,69 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Keyset pagination order (see app/core/pagination.py)
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        # The storefront only ever lists active products; partial indexes keep
+        # its keyset walks off the inactive rows
+        Index("ix_products_active_created_at_id", "created_at", "id",
+              sqlite_where=text("is_active = 1"), postgresql_where=text("is_active")),
+        Index("ix_products_active_price_id", "price", "id",
+              sqlite_where=text("is_active = 1"), postgresql_where=text("is_active")),
+        Index("ix_products_category_id_is_active", "category_id", "is_active"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
     description = Column(Text)
     price = Column(Float, nullable=False)
     stock_quantity = Column(Integer, default=0)
+    # Units held by live cart reservations (kept in step with stock_reservations)
+    reserved_quantity = Column(Integer, nullable=False, default=0, server_default="0")
     category_id = Column(Integer, ForeignKey("categories.id"))
     brand = Column(String)
     model = Column(String)
-    specifications = Column(Text)  # JSON string for detailed specs
-    image_data = Column(LargeBinary)  # For MVP - migrate to cloud later
+    # Large columns are deferred so listing queries don't pull them for every row
+    specifications = deferred(Column(Text))  # JSON string for detailed specs
+    image_data = deferred(Column(LargeBinary))  # Legacy MVP storage - see migrate_images_to_store.py
+    image_key = Column(String, nullable=True)  # SHA-256 content key in the image store
     image_filename = Column(String)
     image_content_type = Column(String)
+    image_uploaded_at = Column(DateTime, nullable=True)  # Last-Modified for the image endpoint
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Computed in SQL so checking for an image never materializes the BLOB
+    has_image = column_property(or_(image_key.isnot(None), image_data.expression.isnot(None)))
+    
     # Relationships
     category = relationship("Category", back_populates="products")
     cart_items = relationship("CartItem", back_populates="product")
     order_items = relationship("OrderItem", back_populates="product")
+    
+    @property
+    def available_quantity(self):
+        """Stock that is neither sold nor held in someone's cart"""
+        return (self.stock_quantity or 0) - (self.reserved_quantity or 0)
+    
+    @property
+    def image_version(self):
+        """Short content hash used to version image URLs (?v=...)"""
+        return self.image_key[:16] if self.image_key else None
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        # One line per product per cart. A unique index rather than a table
+        # constraint so it can be added to existing SQLite tables.
+        Index("uq_cart_items_user_product", "user_id", "product_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     quantity = Column(Integer, default=1)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -81,8 +122,29 @@ class CartItem(Base):
     user = relationship("User", back_populates="cart_items")
     product = relationship("Product", back_populates="cart_items")
 
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", name="uq_stock_reservations_user_product"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Keyset pagination order (see app/core/pagination.py)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        # A customer's order history, newest first
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+        # Admin order listing filtered by status
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -110,8 +172,8 @@ class OrderItem(Base):
     __tablename__ = "order_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float, nullable=False)
     total_price = Column(Float, nullable=False)
@@ -124,7 +186,7 @@ class OrderStatus(Base):
     __tablename__ = "order_statuses"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     status = Column(String, nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     notes = Column(Text, nullable=True)
@@ -148,4 +210,36 @@ class SupportTicket(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The delivery worker's scan: due messages in order
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # verification, order_confirmation, order_status
+    to_email = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON template parameters
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
+    status = Column(String, nullable=False, default="pending")  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # SHA-256 of the opaque token; the token itself is only ever held by the client
+    token_hash = Column(String, nullable=False, unique=True, index=True)
+    # Every token issued by rotating from one login shares its family
+    family_id = Column(String, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=True)  # set when rotated, logged out or revoked
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
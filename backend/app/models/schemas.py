@@ -33,6 +33,11 @@ class User(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # access token lifetime in seconds
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 # Category schemas
 class CategoryBase(BaseModel):
@@ -69,7 +74,10 @@ class Product(ProductBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     category: Optional[Category] = None
+    available_quantity: Optional[int] = None
     has_image: bool = False
+    image_version: Optional[str] = None
+    search_snippet: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -77,7 +85,7 @@ class Product(ProductBase):
     @classmethod
     def from_orm_with_image_check(cls, obj):
         data = obj.__dict__.copy()
-        data['has_image'] = obj.image_data is not None
+        data['has_image'] = obj.has_image
         if 'specifications' in data and data['specifications']:
             try:
                 data['specifications'] = json.loads(data['specifications'])
@@ -1,11 +1,172 @@
 import smtplib
 import secrets
+import threading
+import time
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional, Tuple
 import os
-from jinja2 import Template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+# Authenticated SMTP sessions are kept open and reused: STARTTLS and LOGIN
+# cost several round trips that would otherwise be paid for every message.
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_IDLE_SECONDS = int(os.getenv("SMTP_IDLE_SECONDS", "60"))
+SMTP_TIMEOUT = int(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_NOOP_AFTER_SECONDS = 1.0
+# Set to false for local test servers that don't speak STARTTLS
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+
+# Email bodies live in app/templates/email; base.html holds the shared layout and CSS
+EMAIL_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "email")
+# Compiled template bytecode survives restarts here (defaults to the system temp dir)
+EMAIL_TEMPLATE_CACHE_DIR = os.getenv("EMAIL_TEMPLATE_CACHE_DIR")
+EMAIL_TEMPLATES = ("verification", "order_confirmation", "order_status")
+
+
+def _create_template_environment() -> Environment:
+    if EMAIL_TEMPLATE_CACHE_DIR:
+        os.makedirs(EMAIL_TEMPLATE_CACHE_DIR, exist_ok=True)
+    environment = Environment(
+        loader=FileSystemLoader(EMAIL_TEMPLATE_DIR),
+        autoescape=select_autoescape(["html"]),
+        bytecode_cache=FileSystemBytecodeCache(EMAIL_TEMPLATE_CACHE_DIR),
+        trim_blocks=True,
+        lstrip_blocks=True,
+        # Templates never change while the app runs
+        auto_reload=False
+    )
+    environment.filters["money"] = lambda value: f"${value:.2f}"
+    
+    # Compile everything up front so the first email doesn't pay for it
+    for name in EMAIL_TEMPLATES:
+        environment.get_template(f"{name}.html")
+        environment.get_template(f"{name}.txt")
+    return environment
+
+
+# Global template environment instance
+email_templates = _create_template_environment()
+
+
+class SMTPConnectionPool:
+    """Bounded pool of logged-in SMTP connections.
+
+    Idle connections are checked with NOOP before reuse and dropped after
+    SMTP_IDLE_SECONDS (most servers close them around then anyway).
+    """
+
+    def __init__(self, host: str, port: int, username: str, password: str,
+                 size: int = SMTP_POOL_SIZE, idle_seconds: int = SMTP_IDLE_SECONDS,
+                 use_tls: bool = SMTP_USE_TLS, timeout: int = SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.idle_seconds = idle_seconds
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []  # (last_used, connection), most recently used last
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                last_used, server = self._idle.pop()
+            idle = time.monotonic() - last_used
+            # A connection used a moment ago is assumed alive; send() reconnects if not
+            if idle < self.idle_seconds and (idle < SMTP_NOOP_AFTER_SECONDS or self._is_alive(server)):
+                return server
+            self._close(server)
+        return self._connect()
+
+    def _checkin(self, server: smtplib.SMTP):
+        with self._lock:
+            self._idle.append((time.monotonic(), server))
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it goes back to the pool unless the body raised"""
+        self._slots.acquire()
+        try:
+            server = self._checkout()
+            try:
+                yield server
+            except Exception:
+                self._close(server)
+                raise
+            self._checkin(server)
+        finally:
+            self._slots.release()
+
+    def send(self, messages: list) -> List[bool]:
+        """Send messages over one connection, reconnecting if it drops mid-batch.
+
+        Gives up on the rest of the batch after two connection attempts in a
+        row fail without sending anything.
+        """
+        results = []
+        pending = list(messages)
+        failed_attempts = 0
+        while pending:
+            try:
+                with self.connection() as server:
+                    while pending:
+                        try:
+                            server.send_message(pending[0])
+                            results.append(True)
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                                smtplib.SMTPDataError) as e:
+                            # The server rejected this message; the session is still fine
+                            print(f"Email sending failed: {e}")
+                            results.append(False)
+                        pending.pop(0)
+                        failed_attempts = 0
+            except Exception as e:
+                failed_attempts += 1
+                if failed_attempts >= 2:
+                    print(f"Email sending failed: {e}")
+                    results.extend(False for _ in pending)
+                    break
+        return results
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, server in idle:
+            self._close(server)
+
 
 class EmailService:
     def __init__(self):
@@ -15,225 +176,70 @@ class EmailService:
         self.email = os.getenv("EMAIL_USERNAME", "robostaan@gmail.com")
         self.password = os.getenv("EMAIL_PASSWORD", "hgmg dpgi lttr lxhp")
         self.from_name = os.getenv("EMAIL_FROM_NAME","Robostaan")
+        self.pool = SMTPConnectionPool(self.smtp_server, self.smtp_port, self.email, self.password)
+    
+    def _build_message(self, to_email: str, subject: str, html_content: str, text_content: str = None):
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = f"{self.from_name} <{self.email}>"
+        msg['To'] = to_email
+        
+        # Add text and HTML parts
+        if text_content:
+            text_part = MIMEText(text_content, 'plain')
+            msg.attach(text_part)
+        
+        html_part = MIMEText(html_content, 'html')
+        msg.attach(html_part)
+        return msg
         
     def _send_email(self, to_email: str, subject: str, html_content: str, text_content: str = None):
-        """Send email using SMTP"""
+        """Send email using a pooled SMTP connection"""
+        return self.send_batch([(to_email, subject, html_content, text_content)])[0]
+    
+    def send_batch(self, emails: List[Tuple[str, str, str, Optional[str]]]) -> List[bool]:
+        """Send many (to_email, subject, html_content, text_content) emails over one SMTP session.
+        
+        Returns one success flag per email, in order.
+        """
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f"{self.from_name} <{self.email}>"
-            msg['To'] = to_email
-            
-            # Add text and HTML parts
-            if text_content:
-                text_part = MIMEText(text_content, 'plain')
-                msg.attach(text_part)
-            
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.email, self.password)
-                server.send_message(msg)
-            
-            return True
+            messages = [self._build_message(*email) for email in emails]
         except Exception as e:
             print(f"Email sending failed: {e}")
-            return False
+            return [False] * len(emails)
+        return self.pool.send(messages)
     
     def generate_verification_token(self) -> str:
         """Generate a secure verification token"""
         return secrets.token_urlsafe(32)
     
+    def _render(self, template: str, **context) -> Tuple[str, str]:
+        """Render the HTML and plain-text versions of an email template"""
+        html_content = email_templates.get_template(f"{template}.html").render(**context)
+        text_content = email_templates.get_template(f"{template}.txt").render(**context)
+        return html_content, text_content
+    
     def send_verification_email(self, user_email: str, user_name: str, verification_token: str) -> bool:
         """Send email verification email"""
         verification_link = f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/verify-email?token={verification_token}"
         
         subject = "Verify Your Email - Robostaan Shop"
-        
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Verify Your Email - Robostaan Shop</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: #f97316; color: white; padding: 20px; text-align: center; border-radius: 8px 8px 0 0; }}
-                .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 8px 8px; }}
-                .button {{ background: #f97316; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block; margin: 20px 0; }}
-                .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 14px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🔧 Robostaan Shop</h1>
-                    <p>Welcome to our platform!</p>
-                </div>
-                <div class="content">
-                    <h2>Hello {user_name}!</h2>
-                    <p>Thank you for registering with Robostaan Shop. To complete your registration and start shopping for electronics and manufacturing services, please verify your email address.</p>
-                    
-                    <p>Click the button below to verify your email:</p>
-                    <a href="{verification_link}" class="button">Verify Email Address</a>
-                    
-                    <p>Or copy and paste this link into your browser:</p>
-                    <p style="word-break: break-all; background: #e5e5e5; padding: 10px; border-radius: 4px;">{verification_link}</p>
-                    
-                    <p><strong>Important:</strong> This verification link will expire in 24 hours for security reasons.</p>
-                    
-                    <p>If you didn't create an account with us, please ignore this email.</p>
-                </div>
-                <div class="footer">
-                    <p>© 2024 Robostaan Shop. All rights reserved.</p>
-                    <p>This is an automated message, please do not reply to this email.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        text_content = f"""
-        Welcome to Robostaan Shop!
-        
-        Hello {user_name},
-        
-        Thank you for registering with Robostaan Shop. To complete your registration, please verify your email address by clicking the link below:
-        
-        {verification_link}
-        
-        This link will expire in 24 hours.
-        
-        If you didn't create an account with us, please ignore this email.
-        
-        Best regards,
-        Robostaan Shop Team
-        """
+        html_content, text_content = self._render(
+            "verification",
+            user_name=user_name,
+            verification_link=verification_link
+        )
         
         return self._send_email(user_email, subject, html_content, text_content)
     
     def send_order_confirmation(self, user_email: str, user_name: str, order) -> bool:
         """Send order confirmation email"""
         subject = f"Order Confirmation - {order.order_number}"
-        
-        # Format order items
-        items_html = ""
-        items_text = ""
-        for item in order.order_items:
-            items_html += f"""
-            <tr>
-                <td style="padding: 10px; border-bottom: 1px solid #ddd;">{item.product.name}</td>
-                <td style="padding: 10px; border-bottom: 1px solid #ddd;">{item.quantity}</td>
-                <td style="padding: 10px; border-bottom: 1px solid #ddd;">${item.unit_price:.2f}</td>
-                <td style="padding: 10px; border-bottom: 1px solid #ddd;">${item.total_price:.2f}</td>
-            </tr>
-            """
-            items_text += f"- {item.product.name} (Qty: {item.quantity}) - ${item.total_price:.2f}\n"
-        
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Order Confirmation - Robostaan Shop</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: #f97316; color: white; padding: 20px; text-align: center; border-radius: 8px 8px 0 0; }}
-                .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 8px 8px; }}
-                .order-details {{ background: white; padding: 20px; border-radius: 6px; margin: 20px 0; }}
-                .items-table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-                .items-table th {{ background: #f97316; color: white; padding: 10px; text-align: left; }}
-                .items-table td {{ padding: 10px; border-bottom: 1px solid #ddd; }}
-                .total {{ font-size: 18px; font-weight: bold; color: #f97316; }}
-                .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 14px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🔧 Robostaan Shop</h1>
-                    <p>Order Confirmation</p>
-                </div>
-                <div class="content">
-                    <h2>Hello {user_name}!</h2>
-                    <p>Thank you for your order! We've received your order and are processing it.</p>
-                    
-                    <div class="order-details">
-                        <h3>Order Details</h3>
-                        <p><strong>Order Number:</strong> {order.order_number}</p>
-                        <p><strong>Order Date:</strong> {order.created_at.strftime('%B %d, %Y at %I:%M %p')}</p>
-                        <p><strong>Status:</strong> {order.status.title()}</p>
-                        <p><strong>Payment Method:</strong> {order.payment_method}</p>
-                    </div>
-                    
-                    <h3>Order Items</h3>
-                    <table class="items-table">
-                        <thead>
-                            <tr>
-                                <th>Product</th>
-                                <th>Quantity</th>
-                                <th>Unit Price</th>
-                                <th>Total</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                            {items_html}
-                        </tbody>
-                    </table>
-                    
-                    <div class="total">
-                        <p>Total Amount: ${order.total_amount:.2f}</p>
-                    </div>
-                    
-                    <div class="order-details">
-                        <h3>Shipping Address</h3>
-                        <p>{order.shipping_address}</p>
-                    </div>
-                    
-                    <p>We'll send you another email when your order ships with tracking information.</p>
-                    <p>If you have any questions, please contact our support team.</p>
-                </div>
-                <div class="footer">
-                    <p>© 2024 Robostaan Shop. All rights reserved.</p>
-                    <p>This is an automated message, please do not reply to this email.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        text_content = f"""
-        Order Confirmation - Robostaan Shop
-        
-        Hello {user_name},
-        
-        Thank you for your order! We've received your order and are processing it.
-        
-        Order Details:
-        - Order Number: {order.order_number}
-        - Order Date: {order.created_at.strftime('%B %d, %Y at %I:%M %p')}
-        - Status: {order.status.title()}
-        - Payment Method: {order.payment_method}
-        
-        Order Items:
-        {items_text}
-        
-        Total Amount: ${order.total_amount:.2f}
-        
-        Shipping Address:
-        {order.shipping_address}
-        
-        We'll send you another email when your order ships with tracking information.
-        
-        Best regards,
-        Robostaan Shop Team
-        """
+        html_content, text_content = self._render(
+            "order_confirmation",
+            user_name=user_name,
+            order=order
+        )
         
         return self._send_email(user_email, subject, html_content, text_content)
     
@@ -249,75 +255,15 @@ class EmailService:
         
         subject = f"Order Update - {order.order_number} - {new_status.title()}"
         message = status_messages.get(new_status, f"Your order status has been updated to {new_status}.")
-        
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Order Update - Robostaan Shop</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: #f97316; color: white; padding: 20px; text-align: center; border-radius: 8px 8px 0 0; }}
-                .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 8px 8px; }}
-                .status-badge {{ background: #10b981; color: white; padding: 8px 16px; border-radius: 20px; display: inline-block; font-weight: bold; }}
-                .order-details {{ background: white; padding: 20px; border-radius: 6px; margin: 20px 0; }}
-                .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 14px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🔧 Robostaan Shop</h1>
-                    <p>Order Status Update</p>
-                </div>
-                <div class="content">
-                    <h2>Hello {user_name}!</h2>
-                    <p>{message}</p>
-                    
-                    <div class="order-details">
-                        <h3>Order Information</h3>
-                        <p><strong>Order Number:</strong> {order.order_number}</p>
-                        <p><strong>Status:</strong> <span class="status-badge">{new_status.title()}</span></p>
-                        <p><strong>Updated:</strong> {datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
-                        {f'<p><strong>Tracking Number:</strong> {order.tracking_number}</p>' if order.tracking_number else ''}
-                        {f'<p><strong>Estimated Delivery:</strong> {order.estimated_delivery.strftime("%B %d, %Y") if order.estimated_delivery else "TBD"}</p>' if order.estimated_delivery else ''}
-                        {f'<p><strong>Notes:</strong> {notes}</p>' if notes else ''}
-                    </div>
-                    
-                    <p>You can track your order status anytime by logging into your account.</p>
-                    <p>If you have any questions, please contact our support team.</p>
-                </div>
-                <div class="footer">
-                    <p>© 2024 Robostaan Shop. All rights reserved.</p>
-                    <p>This is an automated message, please do not reply to this email.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        text_content = f"""
-        Order Update - Robostaan Shop
-        
-        Hello {user_name},
-        
-        {message}
-        
-        Order Information:
-        - Order Number: {order.order_number}
-        - Status: {new_status.title()}
-        - Updated: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}
-        {f'- Tracking Number: {order.tracking_number}' if order.tracking_number else ''}
-        {f'- Estimated Delivery: {order.estimated_delivery.strftime("%B %d, %Y") if order.estimated_delivery else "TBD"}' if order.estimated_delivery else ''}
-        {f'- Notes: {notes}' if notes else ''}
-        
-        You can track your order status anytime by logging into your account.
-        
-        Best regards,
-        Robostaan Shop Team
-        """
+        html_content, text_content = self._render(
+            "order_status",
+            user_name=user_name,
+            order=order,
+            new_status=new_status,
+            message=message,
+            notes=notes,
+            updated_at=datetime.now()
+        )
         
         return self._send_email(user_email, subject, html_content, text_content)
 
@@ -0,0 +1,219 @@
+import io
+import os
+import threading
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from dotenv import load_dotenv
+from PIL import Image, UnidentifiedImageError
+
+from app.services.storage import image_store
+
+load_dotenv()
+
+# Responsive sizes served by GET /api/products/{id}/image?w=...
+DERIVATIVE_WIDTHS = tuple(
+    int(width) for width in os.getenv("IMAGE_DERIVATIVE_WIDTHS", "160,320,800").split(",")
+)
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+DERIVATIVE_QUALITY = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", "80"))
+IMAGE_DERIVATIVE_DIR = os.getenv("IMAGE_DERIVATIVE_DIR", "./media/derivatives")
+IMAGE_DERIVATIVE_CACHE_MB = int(os.getenv("IMAGE_DERIVATIVE_CACHE_MB", "512"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# Largest image (width x height) accepted for upload and resizing. A small,
+# well-compressed file can still decode to gigabytes of pixels.
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "40000000"))
+
+
+class ImageTooManyPixels(Exception):
+    """Raised when an image's dimensions exceed IMAGE_MAX_PIXELS"""
+    pass
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Detect the real image type from its leading bytes (never trust the client's content_type)"""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def check_image_dimensions(fileobj):
+    """Reject images over IMAGE_MAX_PIXELS from the header alone, without decoding any pixels.
+
+    Raises ImageTooManyPixels, or UnidentifiedImageError if Pillow can't read
+    the header. The file is rewound afterwards.
+    """
+    try:
+        with Image.open(fileobj) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        raise ImageTooManyPixels(f"Image exceeds {IMAGE_MAX_PIXELS} pixels")
+    finally:
+        fileobj.seek(0)
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ImageTooManyPixels(f"Image is {width}x{height}, more than {IMAGE_MAX_PIXELS} pixels")
+
+
+def snap_width(width: int) -> int:
+    """Round a requested width up to the nearest configured size (keeps the cache small)"""
+    for size in sorted(DERIVATIVE_WIDTHS):
+        if width <= size:
+            return size
+    return max(DERIVATIVE_WIDTHS)
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Prefer WebP when the client advertises it, otherwise JPEG"""
+    if accept and "image/webp" in accept:
+        return "webp"
+    return "jpeg"
+
+
+class DerivativeCache:
+    """On-disk cache of resized images, bounded by total size with LRU eviction"""
+
+    def __init__(self, root: str = IMAGE_DERIVATIVE_DIR, max_bytes: int = IMAGE_DERIVATIVE_CACHE_MB * 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = OrderedDict()  # filename -> size, least recently used first
+        self._total = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        files = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            stat = os.stat(os.path.join(self.root, name))
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total += size
+
+    @staticmethod
+    def filename(key: str, width: int, fmt: str) -> str:
+        return f"{key}-{width}.{fmt}"
+
+    def path(self, key: str, width: int, fmt: str) -> str:
+        return os.path.join(self.root, self.filename(key, width, fmt))
+
+    def get(self, key: str, width: int, fmt: str) -> Optional[str]:
+        """Return the cached file path and mark it recently used, or None on a miss"""
+        name = self.filename(key, width, fmt)
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = os.path.join(self.root, name)
+        try:
+            os.utime(path)  # Persist recency across restarts
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(name)
+            return None
+        return path
+
+    def get_or_create(self, key: str, width: int, fmt: str) -> Optional[str]:
+        """Return the derivative path, generating it on first request"""
+        path = self.get(key, width, fmt)
+        if path:
+            return path
+
+        # Serialize generation per derivative so concurrent misses do the work once
+        name = self.filename(key, width, fmt)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(name, threading.Lock())
+        with key_lock:
+            path = self.get(key, width, fmt)
+            if path is None:
+                path = self._generate(key, width, fmt)
+        with self._lock:
+            self._key_locks.pop(name, None)
+        return path
+
+    def _generate(self, key: str, width: int, fmt: str) -> Optional[str]:
+        pil_format, _ = DERIVATIVE_FORMATS[fmt]
+        source = image_store.local_path(key)
+        try:
+            if source:
+                image = Image.open(source)
+            else:
+                image = Image.open(io.BytesIO(b"".join(image_store.open(key))))
+            with image:
+                # Uploads are checked already; this covers images stored before the limit existed
+                if image.width * image.height > IMAGE_MAX_PIXELS:
+                    raise ImageTooManyPixels(f"{image.width}x{image.height} exceeds {IMAGE_MAX_PIXELS} pixels")
+                image.load()
+                if image.width > width:
+                    height = max(1, round(image.height * width / image.width))
+                    image = image.resize((width, height), Image.LANCZOS)
+                if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                    image = image.convert("RGBA")
+                if pil_format == "JPEG" and image.mode in ("RGBA", "LA"):
+                    # JPEG has no alpha channel; flatten onto white like the product grid background
+                    background = Image.new("RGB", image.size, (255, 255, 255))
+                    background.paste(image, mask=image.getchannel("A"))
+                    image = background
+
+                fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".derivative-")
+                try:
+                    with os.fdopen(fd, "wb") as tmp:
+                        image.save(tmp, pil_format, quality=DERIVATIVE_QUALITY)
+                    path = self.path(key, width, fmt)
+                    os.replace(tmp_path, path)
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+        except (UnidentifiedImageError, Image.DecompressionBombError, ImageTooManyPixels, OSError, ValueError) as e:
+            print(f"Failed to generate {fmt} derivative of {key} at {width}px: {e}")
+            return None
+
+        self._add(self.filename(key, width, fmt), os.path.getsize(path))
+        return path
+
+    def _add(self, name: str, size: int):
+        evicted = []
+        with self._lock:
+            self._forget(name)
+            self._entries[name] = size
+            self._total += size
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_name, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.root, old_name))
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, name: str):
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._total -= size
+
+
+# Global derivative cache and background worker pool
+derivative_cache = DerivativeCache()
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-derivatives")
+
+
+def schedule_derivatives(key: str):
+    """Pre-generate every configured size and format in the background after an upload"""
+    for width in DERIVATIVE_WIDTHS:
+        for fmt in DERIVATIVE_FORMATS:
+            _executor.submit(derivative_cache.get_or_create, key, width, fmt)
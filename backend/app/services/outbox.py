@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session, selectinload
+from app.core.database import SessionLocal
+from app.models import models
+from app.services.email import email_service
+
+load_dotenv()
+
+# Emails are written to the email_outbox table in the same transaction as the
+# order or user they belong to, and delivered by a background worker, so SMTP
+# latency and outages never reach the request path.
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "5"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_RETRY_MAX_SECONDS = int(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+EMAIL_BATCH_SIZE = 20
+# A claimed message is invisible to other workers for this long
+EMAIL_SEND_LEASE_SECONDS = 300
+
+# Set when a transaction that queued mail commits, so the worker doesn't wait
+# out its poll interval. Commits happen in threadpool threads as well as on the
+# event loop, so the event is always set through the worker's loop.
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_wakeup: Optional[asyncio.Event] = None
+
+
+def enqueue_email(db: Session, kind: str, to_email: str, order_id: Optional[int] = None, **params):
+    """Queue an email; it is only sent if the caller's transaction commits"""
+    db.add(models.EmailOutbox(
+        kind=kind,
+        to_email=to_email,
+        order_id=order_id,
+        payload=json.dumps(params),
+        next_attempt_at=datetime.utcnow()
+    ))
+    db.info["outbox_pending"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_worker(session):
+    if session.info.pop("outbox_pending", False) and _worker_loop is not None:
+        try:
+            _worker_loop.call_soon_threadsafe(_wakeup.set)
+        except RuntimeError:
+            pass  # Loop already closed at shutdown; the mail is picked up on the next start
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_wakeup(session):
+    session.info.pop("outbox_pending", None)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: base, 2x base, 4x base, ... capped at EMAIL_RETRY_MAX_SECONDS"""
+    return timedelta(seconds=min(EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), EMAIL_RETRY_MAX_SECONDS))
+
+
+def _load_order(db: Session, order_id: int) -> models.Order:
+    return db.query(models.Order).options(
+        selectinload(models.Order.order_items).joinedload(models.OrderItem.product).load_only(
+            models.Product.name
+        )
+    ).filter(models.Order.id == order_id).one()
+
+
+def _deliver(db: Session, message: models.EmailOutbox) -> bool:
+    params = json.loads(message.payload)
+
+    if message.kind == "verification":
+        return email_service.send_verification_email(
+            user_email=message.to_email,
+            user_name=params["user_name"],
+            verification_token=params["verification_token"]
+        )
+    if message.kind == "order_confirmation":
+        return email_service.send_order_confirmation(
+            user_email=message.to_email,
+            user_name=params["user_name"],
+            order=_load_order(db, message.order_id)
+        )
+    if message.kind == "order_status":
+        return email_service.send_order_status_update(
+            user_email=message.to_email,
+            user_name=params["user_name"],
+            order=_load_order(db, message.order_id),
+            new_status=params["new_status"],
+            notes=params.get("notes")
+        )
+    raise ValueError(f"Unknown email kind: {message.kind}")
+
+
+def _claim(db: Session, message: models.EmailOutbox, now: datetime) -> bool:
+    """Lease the message to this worker; False if another worker took it first"""
+    result = db.execute(
+        update(models.EmailOutbox)
+        .where(
+            models.EmailOutbox.id == message.id,
+            models.EmailOutbox.status == "pending",
+            models.EmailOutbox.next_attempt_at == message.next_attempt_at
+        )
+        .values(next_attempt_at=now + timedelta(seconds=EMAIL_SEND_LEASE_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def process_outbox(db: Session, limit: int = EMAIL_BATCH_SIZE) -> int:
+    """Try to deliver up to `limit` due messages; returns how many were sent"""
+    now = datetime.utcnow()
+    due = db.query(models.EmailOutbox).filter(
+        models.EmailOutbox.status == "pending",
+        models.EmailOutbox.next_attempt_at <= now
+    ).order_by(models.EmailOutbox.next_attempt_at).limit(limit).all()
+
+    sent = 0
+    for message in due:
+        if not _claim(db, message, now):
+            continue
+
+        try:
+            delivered = _deliver(db, message)
+            error = None if delivered else "SMTP delivery failed"
+        except Exception as e:
+            delivered, error = False, str(e)
+
+        message.attempts += 1
+        if delivered:
+            message.status = "sent"
+            message.sent_at = datetime.utcnow()
+            message.last_error = None
+            if message.kind == "order_confirmation":
+                db.query(models.Order).filter(models.Order.id == message.order_id).update(
+                    {"confirmation_sent": True}, synchronize_session=False
+                )
+            sent += 1
+        elif message.attempts >= EMAIL_MAX_ATTEMPTS:
+            message.status = "failed"
+            message.last_error = error
+            print(f"Giving up on {message.kind} email to {message.to_email}: {error}")
+        else:
+            message.next_attempt_at = datetime.utcnow() + retry_delay(message.attempts)
+            message.last_error = error
+        db.commit()
+
+    return sent
+
+
+def _process_once() -> int:
+    db = SessionLocal()
+    try:
+        total = 0
+        while True:
+            sent = process_outbox(db)
+            total += sent
+            if sent < EMAIL_BATCH_SIZE:
+                return total
+    finally:
+        db.close()
+
+
+async def run_email_worker():
+    """Background task: deliver queued email, waking early when new mail is committed"""
+    global _worker_loop, _wakeup
+    _wakeup = asyncio.Event()
+    _worker_loop = asyncio.get_running_loop()
+    while True:
+        _wakeup.clear()
+        try:
+            await run_in_threadpool(_process_once)
+        except Exception as e:
+            print(f"Email outbox processing failed: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), EMAIL_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
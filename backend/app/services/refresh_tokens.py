@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models import models
+
+load_dotenv()
+
+# Long-lived opaque tokens that /api/auth/refresh exchanges for a new access
+# token, so active shoppers don't go back through /login (and PBKDF2) every
+# ACCESS_TOKEN_EXPIRE_MINUTES. Each use rotates the token; presenting one that
+# was already rotated means a copy leaked, and ends the whole login session.
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+REFRESH_TOKEN_PURGE_SECONDS = int(os.getenv("REFRESH_TOKEN_PURGE_SECONDS", "3600"))
+# Browser tabs share one stored refresh token and may refresh with it at the
+# same moment. A token rotated this recently, whose login session is still
+# live, is a race between tabs rather than a leaked copy.
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_TOKEN_REUSE_GRACE_SECONDS", "10"))
+
+
+class InvalidRefreshToken(Exception):
+    """Raised when a refresh token is unknown, expired or revoked"""
+    pass
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _find(db: Session, token: str) -> Optional[models.RefreshToken]:
+    return db.query(models.RefreshToken).filter(models.RefreshToken.token_hash == _hash(token)).first()
+
+
+def _revoke_family(db: Session, family_id: str, now: datetime):
+    db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.family_id == family_id, models.RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _rotated_moments_ago(db: Session, record: models.RefreshToken, now: datetime) -> bool:
+    """True if the token was rotated within the grace window and its family wasn't revoked since"""
+    if record.revoked_at <= now - timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE_SECONDS):
+        return False
+    live_token = db.query(models.RefreshToken.id).filter(
+        models.RefreshToken.family_id == record.family_id,
+        models.RefreshToken.revoked_at.is_(None),
+        models.RefreshToken.expires_at > now
+    ).first()
+    return live_token is not None
+
+
+def issue_refresh_token(db: Session, user_id: int, family_id: Optional[str] = None) -> str:
+    """Create a refresh token for the user and return it; only its hash is stored. The caller commits."""
+    token = secrets.token_urlsafe(32)
+    db.add(models.RefreshToken(
+        user_id=user_id,
+        token_hash=_hash(token),
+        family_id=family_id or secrets.token_hex(16),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return token
+
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[int, str]:
+    """Spend a refresh token: returns (user_id, replacement token).
+
+    Raises InvalidRefreshToken for anything but a live token. A token rotated
+    within REFRESH_TOKEN_REUSE_GRACE_SECONDS by another tab gets a sibling
+    token in the same family; any other reuse of a rotated token revokes the
+    rest of its family. The caller commits in every case.
+    """
+    now = datetime.utcnow()
+    record = _find(db, token)
+    if record is None or record.expires_at <= now:
+        raise InvalidRefreshToken("Unknown or expired refresh token")
+
+    if record.revoked_at is None:
+        # Claim it; if a concurrent request rotated it first, this one loses
+        result = db.execute(
+            update(models.RefreshToken)
+            .where(models.RefreshToken.id == record.id, models.RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            return record.user_id, issue_refresh_token(db, record.user_id, record.family_id)
+        db.refresh(record)
+
+    if _rotated_moments_ago(db, record, now):
+        return record.user_id, issue_refresh_token(db, record.user_id, record.family_id)
+
+    _revoke_family(db, record.family_id, now)
+    raise InvalidRefreshToken("Refresh token was already used")
+
+
+def revoke_refresh_token(db: Session, token: str):
+    """Log out: revoke the token and everything rotated from the same login. The caller commits."""
+    record = _find(db, token)
+    if record is not None:
+        _revoke_family(db, record.family_id, datetime.utcnow())
+
+
+def purge_expired_refresh_tokens(db: Session) -> int:
+    """Delete refresh tokens past their expiry; returns how many were removed"""
+    result = db.execute(
+        delete(models.RefreshToken)
+        .where(models.RefreshToken.expires_at <= datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def _purge_once() -> int:
+    db = SessionLocal()
+    try:
+        return purge_expired_refresh_tokens(db)
+    finally:
+        db.close()
+
+
+async def run_refresh_token_purger():
+    """Background task: delete expired refresh tokens every REFRESH_TOKEN_PURGE_SECONDS"""
+    while True:
+        try:
+            purged = await run_in_threadpool(_purge_once)
+            if purged:
+                print(f"Purged {purged} expired refresh tokens")
+        except Exception as e:
+            print(f"Refresh token purge failed: {e}")
+        await asyncio.sleep(REFRESH_TOKEN_PURGE_SECONDS)
@@ -0,0 +1,192 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models import models
+
+load_dotenv()
+
+# Adding to the cart holds stock for a short while so checkout rarely fails;
+# holds that are not checked out in time are released by the sweeper.
+RESERVATION_TTL_MINUTES = int(os.getenv("RESERVATION_TTL_MINUTES", "15"))
+RESERVATION_SWEEP_SECONDS = int(os.getenv("RESERVATION_SWEEP_SECONDS", "60"))
+RESERVATION_SWEEP_BATCH = 500
+
+# Invariant: products.reserved_quantity is the sum of that product's rows in
+# stock_reservations. Every function below changes both in the same
+# transaction, and claims a reservation by deleting its row first so the
+# sweeper and checkout can never both release the same units.
+
+
+class InsufficientStock(Exception):
+    """Raised when a product does not have enough unreserved stock"""
+    pass
+
+
+def _adjust_reserved(db: Session, product_id: int, delta: int):
+    db.execute(
+        update(models.Product)
+        .where(models.Product.id == product_id)
+        .values(reserved_quantity=models.Product.reserved_quantity + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _claim(db: Session, reservation: models.StockReservation, *criteria) -> bool:
+    """Delete the reservation row; False if someone else got to it first"""
+    result = db.execute(
+        delete(models.StockReservation)
+        .where(models.StockReservation.id == reservation.id, *criteria)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _get_reservation(db: Session, user_id: int, product_id: int) -> Optional[models.StockReservation]:
+    return db.query(models.StockReservation).filter(
+        models.StockReservation.user_id == user_id,
+        models.StockReservation.product_id == product_id
+    ).first()
+
+
+def reserve_stock(db: Session, user_id: int, product_id: int, quantity: int):
+    """Hold `quantity` units of a product for the user's cart and restart the TTL.
+
+    Only the difference to what the user already holds touches the product row.
+    Raises InsufficientStock when the extra units aren't available. The caller
+    commits.
+    """
+    reservation = _get_reservation(db, user_id, product_id)
+    held = reservation.quantity if reservation else 0
+    delta = quantity - held
+
+    if delta > 0:
+        result = db.execute(
+            update(models.Product)
+            .where(
+                models.Product.id == product_id,
+                models.Product.stock_quantity - models.Product.reserved_quantity >= delta
+            )
+            .values(reserved_quantity=models.Product.reserved_quantity + delta)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise InsufficientStock(f"Not enough stock for product {product_id}")
+    elif delta < 0:
+        _adjust_reserved(db, product_id, delta)
+
+    expires_at = datetime.utcnow() + timedelta(minutes=RESERVATION_TTL_MINUTES)
+    if reservation:
+        reservation.quantity = quantity
+        reservation.expires_at = expires_at
+    else:
+        db.add(models.StockReservation(
+            user_id=user_id,
+            product_id=product_id,
+            quantity=quantity,
+            expires_at=expires_at
+        ))
+
+
+def set_stock(db: Session, product_id: int, stock_quantity: int):
+    """Set a product's stock level, never below the units carts currently hold.
+
+    Raises InsufficientStock instead of letting available stock go negative,
+    which would make checkout fail for customers who already hold their
+    units. The caller commits.
+    """
+    result = db.execute(
+        update(models.Product)
+        .where(models.Product.id == product_id, models.Product.reserved_quantity <= stock_quantity)
+        .values(stock_quantity=stock_quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise InsufficientStock(f"Product {product_id} has more units reserved than {stock_quantity}")
+
+
+def release_stock(db: Session, user_id: int, product_id: Optional[int] = None):
+    """Give back the user's hold on one product, or on everything when product_id is None"""
+    query = db.query(models.StockReservation).filter(models.StockReservation.user_id == user_id)
+    if product_id is not None:
+        query = query.filter(models.StockReservation.product_id == product_id)
+
+    for reservation in query.all():
+        if _claim(db, reservation):
+            _adjust_reserved(db, reservation.product_id, -reservation.quantity)
+
+
+def commit_stock(db: Session, user_id: int, product_id: int, quantity: int) -> bool:
+    """Turn the user's hold into a sale at checkout; False when there isn't enough stock.
+
+    With a live reservation covering the line this always succeeds. Without
+    one (it expired, or the line predates reservations) the line competes for
+    whatever stock nobody else is holding.
+    """
+    held = 0
+    reservation = _get_reservation(db, user_id, product_id)
+    if reservation and _claim(db, reservation):
+        held = reservation.quantity
+
+    # stock - (reserved - held) is what's free once our own hold is returned
+    result = db.execute(
+        update(models.Product)
+        .where(
+            models.Product.id == product_id,
+            models.Product.stock_quantity - models.Product.reserved_quantity + held >= quantity
+        )
+        .values(
+            stock_quantity=models.Product.stock_quantity - quantity,
+            reserved_quantity=models.Product.reserved_quantity - held
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def sweep_expired_reservations(db: Session, limit: int = RESERVATION_SWEEP_BATCH) -> int:
+    """Release up to `limit` expired reservations; returns how many were released"""
+    now = datetime.utcnow()
+    expired = db.query(models.StockReservation).filter(
+        models.StockReservation.expires_at <= now
+    ).order_by(models.StockReservation.expires_at).limit(limit).all()
+
+    released = 0
+    for reservation in expired:
+        # Re-check expiry: the owner may have refreshed the hold meanwhile
+        if _claim(db, reservation, models.StockReservation.expires_at <= now):
+            _adjust_reserved(db, reservation.product_id, -reservation.quantity)
+            released += 1
+
+    db.commit()
+    return released
+
+
+def _sweep_once() -> int:
+    db = SessionLocal()
+    try:
+        total = 0
+        while True:
+            released = sweep_expired_reservations(db)
+            total += released
+            if released < RESERVATION_SWEEP_BATCH:
+                return total
+    finally:
+        db.close()
+
+
+async def run_reservation_sweeper():
+    """Background task: release expired reservations every RESERVATION_SWEEP_SECONDS"""
+    while True:
+        try:
+            released = await run_in_threadpool(_sweep_once)
+            if released:
+                print(f"Released {released} expired stock reservations")
+        except Exception as e:
+            print(f"Stock reservation sweep failed: {e}")
+        await asyncio.sleep(RESERVATION_SWEEP_SECONDS)
@@ -0,0 +1,114 @@
+import html
+import re
+from typing import Optional, Tuple
+from sqlalchemy import func, literal_column, text, Table, Column, Integer, MetaData
+from sqlalchemy.orm import Query
+from app.models import models
+
+# Columns indexed for product search, with their BM25 weights (a hit in the
+# name matters far more than one buried in the specifications JSON). The order
+# must match the FTS5 table created by migration 0002_product_search.
+SEARCH_COLUMNS = {
+    "name": 10.0,
+    "description": 1.0,
+    "brand": 5.0,
+    "model": 5.0,
+    "specifications": 0.5,
+}
+
+# Kept off models.Base.metadata so migrations never treat it as a plain table
+products_fts = Table(
+    "products_fts",
+    MetaData(),
+    Column("rowid", Integer, primary_key=True),
+)
+
+# snippet() wraps matches in these private-use characters rather than in HTML,
+# so the product text can be escaped before the <mark> tags are put in
+SNIPPET_MATCH_START = "\ue000"
+SNIPPET_MATCH_END = "\ue001"
+
+# Set by detect_product_search() once the FTS5 index is known to exist
+fts_enabled = False
+
+
+def detect_product_search(engine) -> bool:
+    """Enable FTS5 search if the products_fts index exists.
+
+    The index and its triggers are created by migration 0002_product_search.
+    Only SQLite builds with FTS5 have it; anything else keeps using the
+    LIKE-based search in apply_product_search().
+    """
+    global fts_enabled
+
+    if engine.dialect.name != "sqlite":
+        fts_enabled = False
+        return False
+
+    with engine.connect() as connection:
+        fts_enabled = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+        )).first() is not None
+
+    if not fts_enabled:
+        print("Full-text search unavailable, using LIKE search")
+    return fts_enabled
+
+
+def build_match_expression(search: str) -> Optional[str]:
+    """Turn free user input into a safe FTS5 query: every word must match, as a prefix"""
+    tokens = re.findall(r"\w+", search)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def is_ranked_search(search: Optional[str]) -> bool:
+    """True when apply_product_search() would order results by relevance"""
+    return bool(search) and fts_enabled and build_match_expression(search) is not None
+
+
+def apply_product_search(query: Query, search: str, like_columns=None,
+                         order_by_rank: bool = True) -> Tuple[Query, Optional[object]]:
+    """Filter a Product query by a search string, ranked best match first.
+
+    Returns the query and a snippet expression that callers can add_columns()
+    for and pass through render_snippet(); the snippet is None when FTS5 is
+    not in use.
+    Pass order_by_rank=False when the caller imposes its own (e.g. keyset) order.
+    """
+    match = build_match_expression(search) if fts_enabled else None
+
+    if match is None:
+        # Fallback for non-SQLite databases or input without any searchable words
+        like_columns = like_columns or [
+            models.Product.name,
+            models.Product.description,
+            models.Product.brand,
+        ]
+        search_filter = f"%{search}%"
+        condition = like_columns[0].ilike(search_filter)
+        for column in like_columns[1:]:
+            condition = condition | column.ilike(search_filter)
+        return query.filter(condition), None
+
+    fts = literal_column("products_fts")
+    rank = func.bm25(fts, *SEARCH_COLUMNS.values())
+    snippet = func.snippet(fts, -1, SNIPPET_MATCH_START, SNIPPET_MATCH_END, "…", 12)
+
+    query = query.join(
+        products_fts, products_fts.c.rowid == models.Product.id
+    ).filter(
+        fts.op("MATCH")(match)
+    )
+    if order_by_rank:
+        query = query.order_by(rank)
+
+    return query, snippet.label("search_snippet")
+
+
+def render_snippet(snippet: Optional[str]) -> Optional[str]:
+    """HTML-escape a search snippet and highlight its matches with <mark> tags"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(SNIPPET_MATCH_START, "<mark>").replace(SNIPPET_MATCH_END, "</mark>")
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Iterator, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Storage backend for product images: "local" keeps files on disk, other
+# backends (s3, cloudinary, ...) can be plugged in by subclassing ImageStore.
+STORAGE_TYPE = os.getenv("STORAGE_TYPE", "local")
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "./media/images")
+MAX_IMAGE_UPLOAD_MB = int(os.getenv("MAX_IMAGE_UPLOAD_MB", "10"))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class ImageTooLarge(Exception):
+    """Raised when a streamed upload exceeds the configured maximum size"""
+    pass
+
+
+class ImageStore:
+    """Content-addressed image storage interface.
+
+    Images are identified by the SHA-256 hex digest of their bytes, so the same
+    upload stored twice takes the space of one and keys never go stale.
+    """
+
+    def put(self, data: bytes) -> str:
+        """Store image bytes and return their content key"""
+        raise NotImplementedError
+
+    def put_stream(self, stream: BinaryIO, max_bytes: int = MAX_IMAGE_UPLOAD_MB * 1024 * 1024,
+                   chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, int]:
+        """Store a file-like object chunk by chunk; return (content key, size in bytes)"""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def open(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield the stored bytes in chunks"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path for the key, if the backend has one (lets the API use sendfile)"""
+        return None
+
+    @staticmethod
+    def content_key(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+
+class LocalImageStore(ImageStore):
+    """Stores images under <root>/<aa>/<bb>/<sha256> on the local filesystem"""
+
+    def __init__(self, root: str = IMAGE_STORE_DIR):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        if len(key) != 64 or not all(c in "0123456789abcdef" for c in key):
+            raise ValueError(f"Invalid image key: {key!r}")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data: bytes) -> str:
+        key = self.content_key(data)
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+    def put_stream(self, stream: BinaryIO, max_bytes: int = MAX_IMAGE_UPLOAD_MB * 1024 * 1024,
+                   chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, int]:
+        # The key is only known once every byte has been hashed, so stream into a
+        # temp file first; at most one chunk is held in memory.
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ImageTooLarge(f"Image exceeds {max_bytes} bytes")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            key = digest.hexdigest()
+            path = self._path(key)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key, size
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def open(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+
+def _create_image_store() -> ImageStore:
+    if STORAGE_TYPE in ("local", "blob"):
+        # "blob" was the MVP setting (images in SQLite); it now maps to local disk
+        return LocalImageStore()
+    raise ValueError(f"Unsupported STORAGE_TYPE: {STORAGE_TYPE}")
+
+
+# Global image store instance
+image_store = _create_image_store()
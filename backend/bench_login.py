@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Login Throughput Benchmark
+Reports how many password verifications (the expensive part of /login) the
+server can do per second and per core: inline in one thread, and through the
+password hashing process pool with PASSWORD_HASH_WORKERS workers. It also
+floods the pool past PASSWORD_HASH_QUEUE to show how many logins would be
+answered with 503.
+
+Usage: python bench_login.py [logins]
+"""
+
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.hashing import PasswordHasher, PasswordHasherBusy, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE
+from app.core.security import get_password_hash, verify_password, PASSWORD_HASH_ROUNDS
+
+
+async def _verify_all(hasher, hashed, logins):
+    async def one():
+        try:
+            valid, _ = await hasher.verify("correct horse", hashed)
+            return valid
+        except PasswordHasherBusy:
+            return None
+    return await asyncio.gather(*(one() for _ in range(logins)))
+
+
+def bench_login(logins: int = 200):
+    hashed = get_password_hash("correct horse")
+    print(f"PBKDF2-SHA256 rounds: {PASSWORD_HASH_ROUNDS}")
+
+    start = time.perf_counter()
+    for _ in range(logins):
+        verify_password("correct horse", hashed)
+    inline = logins / (time.perf_counter() - start)
+    print(f"Inline:   {inline:8.1f} logins/s on 1 core")
+
+    # Queue as deep as the batch, to measure raw pool throughput
+    hasher = PasswordHasher(max_queue=logins)
+    hasher.start()
+    try:
+        start = time.perf_counter()
+        asyncio.run(_verify_all(hasher, hashed, logins))
+        pooled = logins / (time.perf_counter() - start)
+    finally:
+        hasher.shutdown()
+    print(f"Pool:     {pooled:8.1f} logins/s on {PASSWORD_HASH_WORKERS} workers "
+          f"({pooled / PASSWORD_HASH_WORKERS:.1f} per core)")
+
+    # The configured queue limit, flooded with the same burst
+    hasher = PasswordHasher()
+    hasher.start()
+    try:
+        results = asyncio.run(_verify_all(hasher, hashed, logins))
+    finally:
+        hasher.shutdown()
+    rejected = results.count(None)
+    print(f"Burst:    {logins} logins with PASSWORD_HASH_QUEUE={PASSWORD_HASH_QUEUE}: "
+          f"{logins - rejected} verified, {rejected} rejected with 503")
+
+
+if __name__ == "__main__":
+    try:
+        bench_login(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
+        print("Login benchmark completed successfully!")
+    except Exception as e:
+        print(f"Error running benchmark: {e}")
+        sys.exit(1)
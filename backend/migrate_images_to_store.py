@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Image Store Migration Script
+Moves product images out of the products.image_data BLOB column into the
+content-addressed image store (app/services/storage.py).
+
+Run `alembic upgrade head` first (it adds the image_key column). Safe to run
+more than once: rows that already have an image_key are skipped.
+"""
+
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.sql import text
+from app.core.database import engine
+from app.services.storage import image_store
+
+
+def migrate_images():
+    """Copy each BLOB into the image store, then clear it from the row"""
+    with engine.connect() as connection:
+        product_ids = [
+            row[0] for row in connection.execute(text(
+                "SELECT id FROM products WHERE image_data IS NOT NULL AND image_key IS NULL"
+            ))
+        ]
+
+    print(f"Found {len(product_ids)} product images to migrate")
+
+    migrated = 0
+    for product_id in product_ids:
+        # One row at a time so only a single image is held in memory
+        with engine.begin() as connection:
+            image_data = connection.execute(
+                text("SELECT image_data FROM products WHERE id = :id"),
+                {"id": product_id}
+            ).scalar()
+            if not image_data:
+                continue
+
+            key = image_store.put(bytes(image_data))
+            connection.execute(
+                text(
+                    "UPDATE products SET image_key = :key, image_data = NULL, "
+                    "image_uploaded_at = COALESCE(image_uploaded_at, :now) WHERE id = :id"
+                ),
+                {"key": key, "now": datetime.utcnow(), "id": product_id}
+            )
+        migrated += 1
+        print(f"  product {product_id} -> {key}")
+
+    return migrated
+
+
+if __name__ == "__main__":
+    print(f"Image store: {image_store.__class__.__name__}")
+    try:
+        migrated = migrate_images()
+
+        if migrated and engine.dialect.name == "sqlite":
+            # Give the freed BLOB pages back to the filesystem
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                connection.execute(text("VACUUM"))
+            print("Database vacuumed")
+
+        print(f"Image migration completed successfully! ({migrated} images moved)")
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        sys.exit(1)
@@ -0,0 +1,51 @@
+from logging.config import fileConfig
+from alembic import context
+from app.core.database import engine, Base
+from app.models import models  # noqa: F401 - registers the tables on Base.metadata
+
+config = context.config
+
+# Skipped when migrations are run from inside the app, so uvicorn keeps its logging
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    # The FTS5 index and its shadow tables are managed by hand (0002_product_search)
+    if type_ == "table":
+        return not name.startswith("products_fts")
+    return True
+
+
+def run_migrations_offline():
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=engine.dialect.name == "sqlite",
+        include_name=include_name,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can't ALTER most things; batch mode rebuilds the table instead
+            render_as_batch=connection.dialect.name == "sqlite",
+            include_name=include_name,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,241 @@
+"""Initial schema
+
+Everything the app used to build with Base.metadata.create_all, plus the
+columns and indexes that were added to existing databases by one-off scripts
+(email verification, image store, stock reservations, query indexes).
+
+Databases created before migrations existed are adopted rather than rebuilt:
+missing tables are created, missing columns and indexes are added, and the
+rest is left alone. Run `alembic upgrade head` on them like on a new database.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tables(metadata):
+    """The schema as of this revision (deliberately not imported from app.models)"""
+    now = sa.func.now()
+
+    sa.Table(
+        "users", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("email", sa.String, unique=True, index=True, nullable=False),
+        sa.Column("hashed_password", sa.String, nullable=False),
+        sa.Column("first_name", sa.String, nullable=False),
+        sa.Column("last_name", sa.String, nullable=False),
+        sa.Column("phone", sa.String),
+        sa.Column("address", sa.Text),
+        sa.Column("city", sa.String),
+        sa.Column("postal_code", sa.String),
+        sa.Column("country", sa.String),
+        sa.Column("is_active", sa.Boolean),
+        sa.Column("is_admin", sa.Boolean),
+        sa.Column("email_verified", sa.Boolean),
+        sa.Column("email_verification_token", sa.String, nullable=True),
+        sa.Column("verification_token_expires", sa.DateTime, nullable=True),
+        sa.Column("last_login", sa.DateTime, nullable=True),
+        sa.Column("login_attempts", sa.Integer),
+        sa.Column("account_locked_until", sa.DateTime, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=now),
+        sa.Index("ix_users_created_at_id", "created_at", "id"),
+    )
+
+    sa.Table(
+        "categories", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("name", sa.String, unique=True, nullable=False),
+        sa.Column("description", sa.Text),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=now),
+    )
+
+    sa.Table(
+        "products", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("name", sa.String, nullable=False, index=True),
+        sa.Column("description", sa.Text),
+        sa.Column("price", sa.Float, nullable=False),
+        sa.Column("stock_quantity", sa.Integer),
+        sa.Column("reserved_quantity", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("category_id", sa.Integer, sa.ForeignKey("categories.id")),
+        sa.Column("brand", sa.String),
+        sa.Column("model", sa.String),
+        sa.Column("specifications", sa.Text),
+        sa.Column("image_data", sa.LargeBinary),
+        sa.Column("image_key", sa.String, nullable=True),
+        sa.Column("image_filename", sa.String),
+        sa.Column("image_content_type", sa.String),
+        sa.Column("image_uploaded_at", sa.DateTime, nullable=True),
+        sa.Column("is_active", sa.Boolean),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=now),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Index("ix_products_created_at_id", "created_at", "id"),
+        sa.Index("ix_products_price_id", "price", "id"),
+        sa.Index("ix_products_active_created_at_id", "created_at", "id",
+                 sqlite_where=sa.text("is_active = 1"), postgresql_where=sa.text("is_active")),
+        sa.Index("ix_products_active_price_id", "price", "id",
+                 sqlite_where=sa.text("is_active = 1"), postgresql_where=sa.text("is_active")),
+        sa.Index("ix_products_category_id_is_active", "category_id", "is_active"),
+    )
+
+    sa.Table(
+        "cart_items", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("product_id", sa.Integer, sa.ForeignKey("products.id"), nullable=False, index=True),
+        sa.Column("quantity", sa.Integer),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=now),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Index("uq_cart_items_user_product", "user_id", "product_id", unique=True),
+    )
+
+    sa.Table(
+        "stock_reservations", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("product_id", sa.Integer, sa.ForeignKey("products.id"), nullable=False, index=True),
+        sa.Column("quantity", sa.Integer, nullable=False),
+        sa.Column("expires_at", sa.DateTime, nullable=False, index=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=now),
+        sa.UniqueConstraint("user_id", "product_id", name="uq_stock_reservations_user_product"),
+    )
+
+    sa.Table(
+        "orders", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("order_number", sa.String, unique=True, nullable=False),
+        sa.Column("total_amount", sa.Float, nullable=False),
+        sa.Column("status", sa.String),
+        sa.Column("shipping_address", sa.Text),
+        sa.Column("billing_address", sa.Text),
+        sa.Column("payment_method", sa.String),
+        sa.Column("payment_status", sa.String),
+        sa.Column("notes", sa.Text),
+        sa.Column("confirmation_sent", sa.Boolean),
+        sa.Column("tracking_number", sa.String, nullable=True),
+        sa.Column("estimated_delivery", sa.DateTime, nullable=True),
+        sa.Column("delivery_notes", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=now),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Index("ix_orders_created_at_id", "created_at", "id"),
+        sa.Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+        sa.Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+    )
+
+    sa.Table(
+        "order_items", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("order_id", sa.Integer, sa.ForeignKey("orders.id"), nullable=False, index=True),
+        sa.Column("product_id", sa.Integer, sa.ForeignKey("products.id"), nullable=False, index=True),
+        sa.Column("quantity", sa.Integer, nullable=False),
+        sa.Column("unit_price", sa.Float, nullable=False),
+        sa.Column("total_price", sa.Float, nullable=False),
+    )
+
+    sa.Table(
+        "order_statuses", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("order_id", sa.Integer, sa.ForeignKey("orders.id"), nullable=False, index=True),
+        sa.Column("status", sa.String, nullable=False),
+        sa.Column("timestamp", sa.DateTime(timezone=True), server_default=now),
+        sa.Column("notes", sa.Text, nullable=True),
+        sa.Column("updated_by", sa.String, nullable=True),
+    )
+
+    sa.Table(
+        "support_tickets", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("ticket_id", sa.String, unique=True, nullable=False),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("name", sa.String),
+        sa.Column("email", sa.String, nullable=False),
+        sa.Column("subject", sa.String),
+        sa.Column("message", sa.Text),
+        sa.Column("status", sa.String),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=now),
+    )
+
+    sa.Table(
+        "email_outbox", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("kind", sa.String, nullable=False),
+        sa.Column("to_email", sa.String, nullable=False),
+        sa.Column("payload", sa.Text, nullable=False),
+        sa.Column("order_id", sa.Integer, sa.ForeignKey("orders.id"), nullable=True),
+        sa.Column("status", sa.String, nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime, nullable=False),
+        sa.Column("last_error", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=now),
+        sa.Column("sent_at", sa.DateTime, nullable=True),
+        sa.Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    return metadata
+
+
+def _merge_duplicate_cart_items(connection):
+    """Fold duplicate cart lines into the oldest one so the unique index can be built"""
+    duplicates = connection.execute(sa.text("""
+        SELECT user_id, product_id, MIN(id), SUM(quantity)
+        FROM cart_items
+        GROUP BY user_id, product_id
+        HAVING COUNT(*) > 1
+    """)).all()
+    for user_id, product_id, keep_id, quantity in duplicates:
+        connection.execute(
+            sa.text("UPDATE cart_items SET quantity = :quantity WHERE id = :id"),
+            {"quantity": quantity, "id": keep_id}
+        )
+        connection.execute(
+            sa.text("DELETE FROM cart_items WHERE user_id = :user_id AND product_id = :product_id AND id != :id"),
+            {"user_id": user_id, "product_id": product_id, "id": keep_id}
+        )
+    if duplicates:
+        print(f"Merged {len(duplicates)} duplicate cart lines")
+
+
+def _adopt(connection, table, inspector):
+    """Bring a table created before migrations up to this revision"""
+    columns = {column["name"] for column in inspector.get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in columns:
+            op.add_column(table.name, sa.Column(
+                column.name,
+                column.type,
+                nullable=column.nullable,
+                server_default=column.server_default.arg if column.server_default else None
+            ))
+
+    if table.name == "cart_items":
+        _merge_duplicate_cart_items(connection)
+
+    indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in indexes:
+            index.create(bind=connection)
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    existing = set(inspector.get_table_names())
+
+    for table in _tables(sa.MetaData()).sorted_tables:
+        if table.name in existing:
+            _adopt(connection, table, inspector)
+        else:
+            table.create(bind=connection)
+
+
+def downgrade():
+    _tables(sa.MetaData()).drop_all(bind=op.get_bind())
@@ -0,0 +1,79 @@
+"""Product full-text search
+
+The FTS5 index over products and the triggers that keep it in sync (see
+app/services/search.py). SQLite only, and only on builds with FTS5; without it
+the app keeps using LIKE search.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.exc import OperationalError
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# Must match SEARCH_COLUMNS in app/services/search.py (the bm25 weights follow this order)
+COLUMNS = ("name", "description", "brand", "model", "specifications")
+
+
+def upgrade():
+    connection = op.get_bind()
+    if connection.dialect.name != "sqlite":
+        return
+
+    columns = ", ".join(COLUMNS)
+    new_columns = ", ".join(f"new.{column}" for column in COLUMNS)
+    old_columns = ", ".join(f"old.{column}" for column in COLUMNS)
+
+    exists = connection.execute(sa.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    )).first()
+
+    try:
+        op.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                {columns},
+                content='products',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+    except OperationalError as e:
+        print(f"Full-text search unavailable, using LIKE search: {e}")
+        return
+
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, {columns}) VALUES (new.id, {new_columns});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+        END
+    """)
+    # Only text edits touch the index; stock and price updates don't
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF {columns} ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+            INSERT INTO products_fts(rowid, {columns}) VALUES (new.id, {new_columns});
+        END
+    """)
+
+    if not exists:
+        # Index the rows that existed before the FTS table did
+        op.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for trigger in ("products_fts_ai", "products_fts_ad", "products_fts_au"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS products_fts")
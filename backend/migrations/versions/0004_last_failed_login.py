@@ -0,0 +1,26 @@
+"""Last failed login
+
+users.last_failed_login lets a failed-login count that has gone stale start
+over, instead of adding to failures from weeks ago.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("last_failed_login", sa.DateTime, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("last_failed_login")
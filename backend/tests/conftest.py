@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway database and media directory before it is imported
+_tmp = tempfile.mkdtemp(prefix="electronics-store-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["IMAGE_STORE_DIR"] = os.path.join(_tmp, "images")
+os.environ["IMAGE_DERIVATIVE_DIR"] = os.path.join(_tmp, "derivatives")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.api.auth import get_current_admin_user
+from app.core.database import SessionLocal, async_engine, engine
+from app.core.principals import Principal
+from app.core.schema import upgrade_schema
+from app.services.search import detect_product_search
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    """The real schema, built by the migrations (including the SQLite FTS5 index)"""
+    upgrade_schema()
+    detect_product_search(engine)
+    yield
+    # Pooled aiosqlite connections each hold a non-daemon thread that would keep pytest from exiting
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    """An anonymous client (startup tasks are not run)"""
+    return TestClient(app)
+
+
+@pytest.fixture
+def admin_client():
+    """A client authenticated as an admin (startup tasks are not run)"""
+    app.dependency_overrides[get_current_admin_user] = lambda: Principal(1, "admin@example.com", True, True)
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+
+@pytest.fixture
+def statements():
+    """SQL statements sent to the database while the test runs"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield executed
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
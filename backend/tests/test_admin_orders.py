@@ -0,0 +1,68 @@
+"""The admin order endpoints must cost the same number of queries however many orders or items they return"""
+import pytest
+
+from app.models import models
+
+
+@pytest.fixture(scope="module")
+def orders():
+    from app.core.database import SessionLocal
+    db = SessionLocal()
+    category = models.Category(name="Orders test")
+    db.add(category)
+    db.flush()
+    products = [
+        models.Product(name=f"Sensor {i}", price=5 + i, stock_quantity=10, category_id=category.id)
+        for i in range(10)
+    ]
+    customers = [
+        models.User(email=f"customer{i}@example.com", hashed_password="x", first_name=f"First{i}", last_name="Last")
+        for i in range(20)
+    ]
+    db.add_all(products + customers)
+    db.flush()
+
+    order_ids = []
+    for i in range(120):
+        order = models.Order(user_id=customers[i % 20].id, order_number=f"ORD-TEST-{i:04d}", total_amount=10)
+        db.add(order)
+        db.flush()
+        # Order i has (i % 10) + 1 items, so the details endpoint sees 1 to 10 of them
+        for product in products[:i % 10 + 1]:
+            db.add(models.OrderItem(order_id=order.id, product_id=product.id, quantity=1,
+                                    unit_price=product.price, total_price=product.price))
+        order_ids.append(order.id)
+    db.commit()
+    db.close()
+    return order_ids
+
+
+def test_order_list_query_count_is_independent_of_page_size(admin_client, orders, statements):
+    counts = {}
+    for limit in (5, 100):
+        statements.clear()
+        response = admin_client.get(f"/api/admin/orders?limit={limit}&count=none")
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body["orders"]) == limit
+        assert all(order["user_email"].startswith("customer") for order in body["orders"])
+        counts[limit] = len(statements)
+
+    assert counts[5] == counts[100]
+
+
+def test_order_details_query_count_is_independent_of_item_count(admin_client, orders, statements):
+    counts = {}
+    for order_id, expected_items in ((orders[0], 1), (orders[9], 10)):
+        statements.clear()
+        response = admin_client.get(f"/api/admin/orders/{order_id}")
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body["items"]) == expected_items
+        assert all(item["product_name"].startswith("Sensor") for item in body["items"])
+        assert body["user"]["email"].startswith("customer")
+        counts[expected_items] = len(statements)
+
+    assert counts[1] == counts[10]
+    # The order with its customer, then the items with their products
+    assert counts[10] <= 2
@@ -0,0 +1,47 @@
+"""Admin stock edits can't drop stock below the units customers hold in their carts"""
+import pytest
+
+from app.models import models
+from app.services.reservations import reserve_stock
+
+
+@pytest.fixture
+def reserved_product(db, request):
+    category = models.Category(name=request.node.name)
+    customer = models.User(email=f"{request.node.name}@example.com", hashed_password="x", first_name="C", last_name="D")
+    db.add_all([category, customer])
+    db.flush()
+    product = models.Product(name="Reserved sensor", price=4.0, stock_quantity=10, category_id=category.id)
+    db.add(product)
+    db.flush()
+    reserve_stock(db, customer.id, product.id, 6)
+    db.commit()
+    return product
+
+
+def _update(admin_client, product, stock_quantity):
+    return admin_client.put(f"/api/admin/products/{product.id}", json={
+        "name": "Reserved sensor v2",
+        "price": 4.5,
+        "stock_quantity": stock_quantity,
+        "category_id": product.category_id
+    })
+
+
+def test_stock_below_reservations_is_rejected(admin_client, db, reserved_product):
+    response = _update(admin_client, reserved_product, 5)
+    assert response.status_code == 400
+    assert "6 units reserved" in response.json()["detail"]
+
+    db.refresh(reserved_product)
+    assert reserved_product.stock_quantity == 10
+    assert reserved_product.name == "Reserved sensor"
+
+
+def test_stock_down_to_reservations_is_allowed(admin_client, db, reserved_product):
+    assert _update(admin_client, reserved_product, 6).status_code == 200
+
+    db.refresh(reserved_product)
+    assert reserved_product.stock_quantity == 6
+    assert reserved_product.name == "Reserved sensor v2"
+    assert reserved_product.available_quantity == 0
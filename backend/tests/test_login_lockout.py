@@ -0,0 +1,86 @@
+"""Account lockout: stale failures start over, and a lock is only revealed to someone who knows the password"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api import auth
+from app.core.hashing import password_hasher
+from app.core.ratelimit import LOGIN_LOCKOUT_MINUTES, LOGIN_MAX_FAILED_ATTEMPTS
+from app.core.security import get_password_hash, verify_and_update_password
+from app.models import models
+
+PASSWORD = "correct horse"
+
+
+@pytest.fixture(autouse=True)
+def inline_hashing(monkeypatch):
+    """Verify passwords in-process instead of in the hashing pool, and lift the rate limits"""
+    async def verify(password, hashed_password):
+        return verify_and_update_password(password, hashed_password)
+
+    monkeypatch.setattr(password_hasher, "verify", verify)
+    monkeypatch.setattr(auth.auth_ip_limiter, "limit", 10000)
+    monkeypatch.setattr(auth.login_email_limiter, "limit", 10000)
+
+
+@pytest.fixture
+def user(db, request):
+    user = models.User(email=f"{request.node.name}@example.com", hashed_password=get_password_hash(PASSWORD),
+                       first_name="Lock", last_name="Out")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _login(client, email, password):
+    return client.post("/api/auth/login", json={"email": email, "password": password})
+
+
+def test_failures_lock_the_account(client, db, user):
+    for _ in range(LOGIN_MAX_FAILED_ATTEMPTS):
+        assert _login(client, user.email, "wrong").status_code == 401
+
+    db.refresh(user)
+    assert user.account_locked_until > datetime.utcnow()
+
+    response = _login(client, user.email, PASSWORD)
+    assert response.status_code == 423
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_stale_failures_start_over(client, db, user):
+    # One short of the lock, but the last failure was long ago
+    user.login_attempts = LOGIN_MAX_FAILED_ATTEMPTS - 1
+    user.last_failed_login = datetime.utcnow() - timedelta(minutes=LOGIN_LOCKOUT_MINUTES + 1)
+    db.commit()
+
+    assert _login(client, user.email, "typo").status_code == 401
+
+    db.refresh(user)
+    assert user.login_attempts == 1
+    assert user.account_locked_until is None
+
+
+def test_locked_account_looks_like_a_wrong_password(client, db, user):
+    user.account_locked_until = datetime.utcnow() + timedelta(minutes=LOGIN_LOCKOUT_MINUTES)
+    db.commit()
+
+    locked = _login(client, user.email, "wrong")
+    unknown = _login(client, "nobody@example.com", "wrong")
+    assert locked.status_code == unknown.status_code == 401
+    assert locked.json() == unknown.json()
+    assert "Retry-After" not in locked.headers
+
+    # Failures while locked don't extend the lock
+    locked_until = user.account_locked_until
+    db.refresh(user)
+    assert user.account_locked_until == locked_until
+
+
+def test_successful_login_clears_the_failures(client, db, user):
+    assert _login(client, user.email, "wrong").status_code == 401
+    assert _login(client, user.email, PASSWORD).status_code == 200
+
+    db.refresh(user)
+    assert user.login_attempts == 0
+    assert user.last_failed_login is None
@@ -0,0 +1,42 @@
+"""Listings leave the deferred specifications column out unless asked for it"""
+import json
+
+import pytest
+
+from app.models import models
+
+SPECIFICATIONS = {"voltage": "3.3V", "pins": 40}
+
+
+@pytest.fixture(scope="module")
+def specced_product():
+    from app.core.database import SessionLocal
+    db = SessionLocal()
+    category = models.Category(name="Listing test")
+    db.add(category)
+    db.flush()
+    product = models.Product(name="Specced board", price=9.0, stock_quantity=4, category_id=category.id,
+                             specifications=json.dumps(SPECIFICATIONS), is_active=True)
+    db.add(product)
+    db.commit()
+    product_id = product.id
+    db.close()
+    return product_id
+
+
+def _listed(response, product_id):
+    assert response.status_code == 200
+    body = response.json()
+    products = body["products"] if isinstance(body, dict) else body
+    [product] = [p for p in products if p["id"] == product_id]
+    return product
+
+
+@pytest.mark.parametrize("url", ["/api/products/?limit=100", "/api/admin/products?limit=100"])
+def test_listings_omit_specifications_by_default(client, admin_client, specced_product, url):
+    http = admin_client if url.startswith("/api/admin") else client
+    assert _listed(http.get(url), specced_product)["specifications"] is None
+
+    with_specs = _listed(http.get(url + "&include_specifications=true"), specced_product)["specifications"]
+    assert (json.loads(with_specs) if isinstance(with_specs, str) else with_specs) == SPECIFICATIONS
+
@@ -0,0 +1,52 @@
+"""Product search snippets are HTML: product text must be escaped, only the match highlighting is markup"""
+import pytest
+
+from app.models import models
+from app.services import search
+
+
+@pytest.fixture(scope="module")
+def script_product():
+    from app.core.database import SessionLocal
+    db = SessionLocal()
+    category = models.Category(name="Search test")
+    db.add(category)
+    db.flush()
+    product = models.Product(
+        name="<script>alert(1)</script> board",
+        description='Breakout board with <img src=x onerror="alert(2)"> pins & headers',
+        price=12.5,
+        stock_quantity=3,
+        category_id=category.id,
+        is_active=True
+    )
+    db.add(product)
+    db.commit()
+    product_id = product.id
+    db.close()
+    return product_id
+
+
+def test_fts_index_is_built_by_the_migrations():
+    assert search.fts_enabled
+
+
+@pytest.mark.parametrize("url", ["/api/products/?search=script", "/api/admin/products?search=script"])
+def test_search_snippet_escapes_product_text(client, admin_client, script_product, url):
+    http = admin_client if url.startswith("/api/admin") else client
+    response = http.get(url)
+    assert response.status_code == 200
+    body = response.json()
+    products = body["products"] if isinstance(body, dict) else body
+    [product] = [p for p in products if p["id"] == script_product]
+
+    snippet = product["search_snippet"]
+    assert "<script" not in snippet
+    assert "&lt;<mark>script</mark>&gt;alert(1)&lt;/<mark>script</mark>&gt; board" in snippet
+    assert snippet.replace("<mark>", "").replace("</mark>", "").count("<") == 0
+
+
+def test_render_snippet_escapes_everything_but_the_match_markers():
+    raw = f'a <b onclick="x"> & {search.SNIPPET_MATCH_START}board{search.SNIPPET_MATCH_END}'
+    assert search.render_snippet(raw) == "a &lt;b onclick=&quot;x&quot;&gt; &amp; <mark>board</mark>"
+    assert search.render_snippet(None) is None
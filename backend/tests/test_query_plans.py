@@ -0,0 +1,79 @@
+"""EXPLAIN QUERY PLAN for the queries behind the busiest endpoints: none may scan a whole table.
+
+The schema comes from the migrations (alembic upgrade head, see conftest.py),
+so a migration that drops or forgets an index fails here. SQLite only.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.database import engine
+from app.models import models
+
+pytestmark = pytest.mark.skipif(engine.dialect.name != "sqlite", reason="EXPLAIN QUERY PLAN is SQLite syntax")
+
+now = datetime.utcnow()
+
+# The WHERE/ORDER BY shapes used by cart.py, orders.py, admin.py and the
+# background workers; parameter values don't matter for the plan.
+HOT_QUERIES = {
+    "login / current user": select(models.User).where(models.User.email == "user@example.com"),
+    "refresh token": select(models.RefreshToken).where(models.RefreshToken.token_hash == "0" * 64),
+    "cart lines": select(models.CartItem).where(models.CartItem.user_id == 1),
+    "cart line for a product": select(models.CartItem).where(
+        models.CartItem.user_id == 1, models.CartItem.product_id == 1
+    ),
+    "cart total": select(func.sum(models.Product.price * models.CartItem.quantity)).select_from(
+        models.CartItem
+    ).join(
+        models.Product, models.CartItem.product_id == models.Product.id
+    ).where(models.CartItem.user_id == 1),
+    "cart lines of a product": select(models.CartItem).where(models.CartItem.product_id == 1),
+    "stock reservation": select(models.StockReservation).where(
+        models.StockReservation.user_id == 1, models.StockReservation.product_id == 1
+    ),
+    "order history": select(models.Order).where(models.Order.user_id == 1).order_by(
+        models.Order.created_at.desc()
+    ),
+    "items of orders": select(models.OrderItem).where(models.OrderItem.order_id.in_([1, 2, 3])),
+    "orders containing a product": select(models.OrderItem).where(models.OrderItem.product_id == 1).limit(1),
+    "order status history": select(models.OrderStatus).where(models.OrderStatus.order_id == 1),
+    "admin orders by status": select(models.Order).where(models.Order.status == "pending").order_by(
+        models.Order.created_at.desc(), models.Order.id.desc()
+    ).limit(20),
+    "catalogue, newest": select(models.Product).where(models.Product.is_active == True).order_by(
+        models.Product.created_at.desc(), models.Product.id.desc()
+    ).limit(50),
+    "catalogue, by price": select(models.Product).where(models.Product.is_active == True).order_by(
+        models.Product.price, models.Product.id
+    ).limit(50),
+    "catalogue, one category": select(models.Product).where(
+        models.Product.is_active == True, models.Product.category_id == 1
+    ).order_by(models.Product.created_at.desc(), models.Product.id.desc()).limit(50),
+    "expired reservations": select(models.StockReservation).where(
+        models.StockReservation.expires_at <= now
+    ).order_by(models.StockReservation.expires_at).limit(500),
+    "expired refresh tokens": select(models.RefreshToken.id).where(models.RefreshToken.expires_at <= now),
+    "due emails": select(models.EmailOutbox).where(
+        models.EmailOutbox.status == "pending", models.EmailOutbox.next_attempt_at <= now
+    ).order_by(models.EmailOutbox.next_attempt_at).limit(20),
+}
+
+
+def explain(connection, statement):
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    return [row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+
+
+def full_scans(plan):
+    """Plan steps that read every row of a table (an ordered walk of an index is fine)"""
+    return [step for step in plan if step.startswith("SCAN ") and "USING" not in step]
+
+
+@pytest.mark.parametrize("name", list(HOT_QUERIES))
+def test_hot_query_uses_an_index(name):
+    with engine.connect() as connection:
+        plan = explain(connection, HOT_QUERIES[name])
+    assert not full_scans(plan), f"{name} scans a full table: {'; '.join(plan)}"
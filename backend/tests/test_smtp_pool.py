@@ -0,0 +1,146 @@
+"""SMTPConnectionPool against a local aiosmtpd server: session reuse, reconnects and the size bound"""
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.services import email as email_module
+from app.services.email import EmailService, SMTPConnectionPool
+
+
+class RecordingHandler:
+    """Remembers which client connection (peer address) delivered each message"""
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.peers = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+            self.peers.append(session.peer)
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalSMTPServer:
+    """aiosmtpd on a fixed local port that can be restarted, dropping every open session"""
+
+    def __init__(self):
+        self.handler = RecordingHandler()
+        self.hostname = "127.0.0.1"
+        self.port = _free_port()
+        self._controller = None
+
+    def start(self):
+        self._controller = Controller(self.handler, hostname=self.hostname, port=self.port)
+        self._controller.start()
+
+    def stop(self):
+        if self._controller is not None:
+            self._controller.stop()
+            self._controller = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+
+@pytest.fixture
+def smtp_server():
+    server = LocalSMTPServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+def _service(server: LocalSMTPServer, size: int = 2) -> EmailService:
+    service = EmailService()
+    service.pool = SMTPConnectionPool(server.hostname, server.port, "store@example.com", "",
+                                      size=size, use_tls=False)
+    return service
+
+
+def _emails(count: int):
+    return [(f"customer{i}@example.com", "Order update", "<p>Shipped</p>", "Shipped") for i in range(count)]
+
+
+def test_batch_is_sent_over_one_reused_session(smtp_server):
+    service = _service(smtp_server)
+    try:
+        assert service.send_batch(_emails(5)) == [True] * 5
+        assert service._send_email("customer@example.com", "Hello", "<p>Hi</p>", "Hi")
+
+        peers = smtp_server.handler.peers
+        assert len(peers) == 6
+        assert len(set(peers)) == 1
+    finally:
+        service.pool.close()
+
+
+def test_dead_connection_is_detected_with_noop_and_replaced(smtp_server, monkeypatch):
+    service = _service(smtp_server)
+    try:
+        assert service._send_email("customer@example.com", "First", "<p>1</p>", "1")
+
+        # Restarting the server drops the pooled session behind the pool's back
+        smtp_server.restart()
+
+        # Force the liveness check even though the session was used a moment ago
+        monkeypatch.setattr(email_module, "SMTP_NOOP_AFTER_SECONDS", 0)
+        checks = []
+        is_alive = SMTPConnectionPool._is_alive
+        monkeypatch.setattr(SMTPConnectionPool, "_is_alive",
+                            staticmethod(lambda server: checks.append(is_alive(server)) or checks[-1]))
+
+        assert service._send_email("customer@example.com", "Second", "<p>2</p>", "2")
+        assert checks == [False]
+        peers = smtp_server.handler.peers
+        assert len(peers) == 2
+        assert peers[0] != peers[1]
+    finally:
+        service.pool.close()
+
+
+def test_pool_never_opens_more_sessions_than_its_size(smtp_server, monkeypatch):
+    smtp_server.handler.delay = 0.02
+    service = _service(smtp_server, size=2)
+    opened = []
+    connect = SMTPConnectionPool._connect
+
+    def counting_connect(pool):
+        opened.append(time.monotonic())
+        return connect(pool)
+
+    monkeypatch.setattr(SMTPConnectionPool, "_connect", counting_connect)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.send_batch(_emails(3)))) for _ in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [[True] * 3] * 8
+        assert len(opened) <= 2
+        assert smtp_server.handler.max_active <= 2
+        assert len(set(smtp_server.handler.peers)) <= 2
+        assert len(service.pool._idle) <= 2
+    finally:
+        service.pool.close()
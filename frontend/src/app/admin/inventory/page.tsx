@@ -30,6 +30,7 @@ interface Product {
   created_at: string;
   updated_at: string;
   has_image: boolean;
+  image_version?: string;
 }
 
 interface Category {
@@ -368,7 +369,7 @@ export default function InventoryManagement() {
                             <div className="h-10 w-10 bg-gray-200 rounded-lg flex items-center justify-center">
                               {product.has_image ? (
                                 <img 
-                                  src={`${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'}/api/products/${product.id}/image`}
+                                  src={`${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'}/api/products/${product.id}/image?w=160${product.image_version ? `&v=${product.image_version}` : ''}`}
                                   alt={product.name}
                                   className="h-10 w-10 rounded-lg object-cover"
                                 />
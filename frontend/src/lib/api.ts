@@ -18,12 +18,51 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
-// Handle auth errors
+// One refresh at a time: concurrent 401s wait for the same renewal, since
+// each refresh token can only be used once
+let refreshing: Promise<string> | null = null;
+
+const refreshAccessToken = () => {
+  if (!refreshing) {
+    const refreshToken = localStorage.getItem('refreshToken');
+    refreshing = (refreshToken
+      ? axios.post(`${API_BASE_URL}/api/auth/refresh`, { refresh_token: refreshToken }).then((response) => {
+          localStorage.setItem('token', response.data.access_token);
+          localStorage.setItem('refreshToken', response.data.refresh_token);
+          return response.data.access_token as string;
+        })
+      : Promise.reject(new Error('No refresh token'))
+    ).finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
+// Endpoints whose 401 means bad credentials or a dead session, not an expired
+// access token (refreshing on these would loop or be pointless)
+const NO_REFRESH_URLS = ['/api/auth/login', '/api/auth/refresh', '/api/auth/logout'];
+
+const shouldRefresh = (url?: string) => !NO_REFRESH_URLS.some((path) => url?.startsWith(path));
+
+// Handle auth errors: renew an expired access token once, else back to login
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const request = error.config;
+    if (error.response?.status === 401 && request && !request._retried && shouldRefresh(request.url)) {
+      request._retried = true;
+      try {
+        const token = await refreshAccessToken();
+        request.headers.Authorization = `Bearer ${token}`;
+        return api(request);
+      } catch (refreshError) {
+        // fall through to the login redirect
+      }
+    }
     if (error.response?.status === 401) {
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
       window.location.href = '/login';
     }
     return Promise.reject(error);
@@ -26,11 +26,13 @@ export interface Product {
   category_id: number;
   brand?: string;
   model?: string;
+  // Listings only include it when requested with include_specifications=true
   specifications?: any;
   is_active: boolean;
   created_at: string;
   updated_at?: string;
   has_image: boolean;
+  image_version?: string;
   category?: Category;
 }
 
@@ -82,6 +84,7 @@ export const authAPI = {
     api.post('/api/auth/login', credentials),
   getProfile: () => api.get('/api/auth/me'),
   updateProfile: (userData: any) => api.put('/api/auth/me', userData),
+  logout: (refreshToken: string) => api.post('/api/auth/logout', { refresh_token: refreshToken }),
 };
 
 // Products API